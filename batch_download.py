@@ -10,18 +10,119 @@ Usage:
 
 import os
 import sys
-import subprocess
 import csv
 import time
+import json
+import array
 import zipfile
+import shutil
 import signal
 import threading
 import logging
+import argparse
 import multiprocessing as mp
+from functools import lru_cache, partial
 from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from collections import defaultdict, deque
 from datetime import datetime
+from enum import IntEnum
+from itertools import chain, islice
+
+from scripts.scene_utils import PARALLEL_UNLINK_MIN_FILES, remove_files
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None  # The CSVs are read with the csv module instead
+
+
+class Phase(IntEnum):
+    """Where a scene's processing ended; the 'phase' of process_single_scene() results."""
+    COMPLETED = 0
+    SKIPPED = 1
+    SKIPPED_NO_HIGHRES = 2
+    REMOVED_NO_HIGHRES = 3
+    REMOVED = 4
+    REMOVAL_FAILED = 5
+    MISSING_INTRINSICS = 6
+    DOWNLOAD = 7
+    REDOWNLOAD_FAILED = 8
+    REMOVED_MISSING_INTRINSICS = 9
+    PROCESSING = 10
+    EXCEPTION = 11
+    CANCELLED = 12
+    UNKNOWN = 13
+    
+    @property
+    def label(self):
+        """Lower-case name for messages (str() of an IntEnum is its value on 3.11+)."""
+        return self.name.lower()
+
+
+# Successful results that count as skipped rather than processed
+SKIPPED_PHASES = frozenset({Phase.SKIPPED, Phase.SKIPPED_NO_HIGHRES, Phase.REMOVED_NO_HIGHRES})
+# Failed results where the scene was removed (or its removal failed)
+REMOVED_PHASES = frozenset({Phase.REMOVED, Phase.REMOVED_MISSING_INTRINSICS,
+                            Phase.REDOWNLOAD_FAILED, Phase.REMOVAL_FAILED})
+
+
+# Downloader module, imported once per process by _worker_init() (pool workers and,
+# for inline batches, the main process)
+download_data = None
+# Per-process thread pool for a scene's asset downloads, shared by every scene
+# the process handles. Replaced when a download times out, see run_download().
+MAX_ASSET_DOWNLOADS = 4
+_asset_executor = None
+# Data built once in the parent and installed in each process by _worker_init():
+#   'highres_map':  {video_id: has_highres_depth} from load_highres_map(); absent
+#                   means has_highres_depth_available() reads metadata.csv itself
+#   'scene_worker': process_single_scene() with the batch-wide settings bound,
+#                   so tasks only carry the scene
+#   'shutdown':     mp.Event the parent sets on Ctrl+C (pool workers only)
+_WORKER_STATE = {}
+
+
+def _start_asset_executor():
+    return ThreadPoolExecutor(max_workers=MAX_ASSET_DOWNLOADS, thread_name_prefix='asset-download')
+
+
+def _worker_init(quiet=True, highres_map=None, scene_settings=None, shutdown_event=None):
+    """
+    Initialize a worker process: import the downloader once, start the asset
+    download pool, install the highres map and the batch's scene settings
+    (keyword arguments of process_single_scene), and optionally silence output.
+    Pool workers get the parent's shutdown_event; they leave SIGINT to the parent,
+    which relays it through the event.
+    """
+    global download_data, _asset_executor
+    try:
+        import download_data
+    except ImportError:
+        # The downloader needs pandas; validation and cleaning work without it
+        download_data = None
+    
+    if shutdown_event is not None:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        _WORKER_STATE['shutdown'] = shutdown_event
+    if highres_map is not None:
+        _WORKER_STATE['highres_map'] = highres_map
+    else:
+        _WORKER_STATE.pop('highres_map', None)
+    if scene_settings is not None:
+        _WORKER_STATE['scene_worker'] = partial(process_single_scene, **scene_settings)
+    
+    if _asset_executor is None:
+        _asset_executor = _start_asset_executor()
+    
+    if quiet:
+        # Downloads run in-process, so redirect the worker's own stdout/stderr
+        # (inherited by curl/unzip) instead of piping each call to DEVNULL
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        os.dup2(devnull, sys.stderr.fileno())
 
 
 def setup_logging(log_file=None, verbose=False):
@@ -74,7 +175,15 @@ def log_and_print(logger, message, level=logging.INFO, force_print=False):
 
 
 class ProgressTracker:
-    """Thread-safe progress tracker for multiprocessing."""
+    """Progress tracker for multiprocessing, written by the main thread and read by the display thread."""
+    
+    # Slots in the packed counter array
+    COMPLETED, SUCCESS, SKIPPED, FAIL_DL, FAIL_PROC = range(5)
+    
+    # Progress bar glyphs, sliced to length instead of rebuilt on every redraw
+    PROGRESS_WIDTH = 30
+    BAR_FILLED = '█' * PROGRESS_WIDTH
+    BAR_EMPTY = '▒' * PROGRESS_WIDTH
     
     def __init__(self, total_scenes, update_interval=2.0, logger=None, is_background=False):
         self.total_scenes = total_scenes
@@ -83,26 +192,48 @@ class ProgressTracker:
         self.logger = logger
         self.is_background = is_background
         
-        # Thread-safe counters
-        self.lock = threading.Lock()
-        self.completed = 0
-        self.success_count = 0
-        self.skipped_count = 0
-        self.failed_downloads = []
-        self.failed_processing = []
-        self.successful_scenes = []  # List of (video_id, split) tuples
+        # Counters have a single writer (the thread draining results) and readers
+        # only need a consistent-enough snapshot, so no lock is taken. Under the
+        # GIL array item stores and deque.append are atomic. Keeping the counts in
+        # one packed array lets readers copy them all with a single tolist().
+        self._counters = array.array('Q', [0] * 5)
+        self.failed_downloads = deque()
+        self.failed_processing = deque()
+        # (video_id, split) tuples; each scene completes once, so the buffer is sized
+        # up front and filled through a cursor instead of grown by append()
+        self._successful_scenes = [None] * total_scenes
+        self._successful_count = 0
         
         # Progress display
         self.last_update = 0
         self.last_log_time = 0
+        self._last_drawn = None  # Counter snapshot behind the line currently on screen
         self.display_thread = None
         self.stop_display = False
+        # Set on every update (and on stop) to wake the display thread
+        self._tick = threading.Event()
         
-        # Recent completions for rate calculation
-        self.recent_completions = []
+        # Completion times within the last minute, oldest first, for rate calculation
+        self.recent_completions = deque()
         
         # Background mode settings
         self.log_interval = 300 if is_background else 30  # 5 min vs 30 sec
+    
+    @property
+    def completed(self):
+        return self._counters[self.COMPLETED]
+    
+    @property
+    def success_count(self):
+        return self._counters[self.SUCCESS]
+    
+    @property
+    def skipped_count(self):
+        return self._counters[self.SKIPPED]
+    
+    def _snapshot(self):
+        """Copy all counters at once: [completed, success, skipped, failed_dl, failed_proc]."""
+        return self._counters.tolist()
         
     def start_display(self):
         """Start the progress display thread."""
@@ -112,43 +243,62 @@ class ProgressTracker:
     def stop_display_thread(self):
         """Stop the progress display thread."""
         self.stop_display = True
+        self._tick.set()
         if self.display_thread:
             self.display_thread.join(timeout=1)
     
     def update(self, result, split=None):
-        """Thread-safe update of progress."""
-        with self.lock:
-            self.completed += 1
-            self.recent_completions.append(time.time())
-            
-            # Keep only recent completions for rate calculation
-            cutoff_time = time.time() - 60  # Last minute
-            self.recent_completions = [t for t in self.recent_completions if t > cutoff_time]
-            
-            phase = result.get('phase', 'unknown')
-            video_id = result['video_id']
-            
-            if result['success']:
-                if phase in ['skipped', 'skipped_no_highres', 'removed_no_highres']:
-                    self.skipped_count += 1
-                else:
-                    self.success_count += 1
-                    if split:
-                        self.successful_scenes.append((video_id, split))
+        """Record a completed scene (called from the result-draining thread only)."""
+        if result.get('phase') == Phase.CANCELLED:
+            return  # Stopped by a shutdown request; neither processed nor failed
+        
+        now = time.time()
+        recent_completions = self.recent_completions
+        recent_completions.append(now)
+        
+        # Keep only recent completions for rate calculation; entries arrive in
+        # time order, so expired ones are always at the head
+        cutoff_time = now - 60  # Last minute
+        while recent_completions[0] <= cutoff_time:
+            recent_completions.popleft()
+        
+        phase = result.get('phase', Phase.UNKNOWN)
+        video_id = result['video_id']
+        counters = self._counters
+        
+        if result['success']:
+            if phase in SKIPPED_PHASES:
+                counters[self.SKIPPED] += 1
             else:
-                # Handle different failure types
-                if phase in ['removed', 'removed_missing_intrinsics', 'redownload_failed', 'removal_failed']:
-                    # These are special cases where scene was removed
-                    self.failed_processing.append(f"{video_id} ({phase})")
-                elif phase == 'download':
-                    self.failed_downloads.append(video_id)
-                else:
-                    self.failed_processing.append(video_id)
-                
-                # Log failures immediately in background mode
-                if self.is_background and self.logger:
-                    error_msg = result.get('error', 'Unknown error')
-                    self.logger.warning(f"Failed {phase}: {video_id} - {error_msg}")
+                counters[self.SUCCESS] += 1
+                if split:
+                    cursor = self._successful_count
+                    if cursor < len(self._successful_scenes):
+                        self._successful_scenes[cursor] = (video_id, split)
+                    else:
+                        self._successful_scenes.append((video_id, split))
+                    self._successful_count = cursor + 1
+        else:
+            # Handle different failure types
+            if phase in REMOVED_PHASES:
+                # These are special cases where scene was removed
+                self.failed_processing.append(f"{video_id} ({phase.label})")
+                counters[self.FAIL_PROC] += 1
+            elif phase == Phase.DOWNLOAD:
+                self.failed_downloads.append(video_id)
+                counters[self.FAIL_DL] += 1
+            else:
+                self.failed_processing.append(video_id)
+                counters[self.FAIL_PROC] += 1
+            
+            # Log failures immediately in background mode
+            if self.is_background and self.logger:
+                error_msg = result.get('error', 'Unknown error')
+                self.logger.warning(f"Failed {phase.label}: {video_id} - {error_msg}")
+        
+        # Bump completed last so readers never see it ahead of the per-type counts
+        counters[self.COMPLETED] += 1
+        self._tick.set()
     
     def _display_progress(self):
         """Background thread that updates progress display."""
@@ -167,116 +317,264 @@ class ProgressTracker:
                 self._log_progress()
                 self.last_log_time = current_time
             
-            time.sleep(0.5)
+            # Sleep until something completes, waking at least every update_interval
+            # so rate and ETA keep moving while scenes are in flight
+            self._tick.wait(timeout=self.update_interval)
+            self._tick.clear()
     
     def _print_progress(self):
         """Print current progress (called by display thread)."""
-        with self.lock:
-            elapsed = time.time() - self.start_time
-            
-            # Calculate rate from recent completions
-            if len(self.recent_completions) >= 2:
-                recent_time_span = self.recent_completions[-1] - self.recent_completions[0]
-                if recent_time_span > 0:
-                    rate = (len(self.recent_completions) - 1) / recent_time_span * 60
-                else:
-                    rate = 0
+        # Snapshot counters once; they may advance while we format
+        snapshot = self._snapshot()
+        if snapshot == self._last_drawn:
+            return  # Nothing completed since the last redraw
+        self._last_drawn = snapshot
+        completed, success, skipped, failed_dl, failed_proc = snapshot
+        elapsed = time.time() - self.start_time
+        
+        # Calculate rate from recent completions (the newest entry is never popped,
+        # so the window can't empty out under us once it has two entries)
+        recent_count = len(self.recent_completions)
+        if recent_count >= 2:
+            recent_time_span = self.recent_completions[-1] - self.recent_completions[0]
+            if recent_time_span > 0:
+                rate = (recent_count - 1) / recent_time_span * 60
             else:
-                rate = self.completed / elapsed * 60 if elapsed > 0 else 0
-            
-            remaining = self.total_scenes - self.completed
-            eta_seconds = remaining / rate * 60 if rate > 0 else 0
-            eta_minutes = eta_seconds / 60
-            
-            # Progress bar
-            progress_width = 30
-            filled = int(progress_width * self.completed / self.total_scenes)
-            bar = '█' * filled + '▒' * (progress_width - filled)
-            
-            percentage = self.completed / self.total_scenes * 100
-            
-            # Clear line and print progress
-            print(f"\r\033[K📊 [{bar}] {percentage:5.1f}% | "
-                  f"{self.completed:4d}/{self.total_scenes} | "
-                  f"✅ {self.success_count} ⏭️ {self.skipped_count} ❌ {len(self.failed_downloads + self.failed_processing)} | "
-                  f"{rate:5.1f}/min | ETA: {eta_minutes:4.0f}m", 
-                  end='', flush=True)
+                rate = 0
+        else:
+            rate = completed / elapsed * 60 if elapsed > 0 else 0
+        
+        remaining = self.total_scenes - completed
+        eta_seconds = remaining / rate * 60 if rate > 0 else 0
+        eta_minutes = eta_seconds / 60
+        
+        # Progress bar
+        filled = int(self.PROGRESS_WIDTH * completed / self.total_scenes)
+        bar = self.BAR_FILLED[:filled] + self.BAR_EMPTY[filled:]
+        
+        percentage = completed / self.total_scenes * 100
+        
+        # Clear line and print progress
+        print(f"\r\033[K📊 [{bar}] {percentage:5.1f}% | "
+              f"{completed:4d}/{self.total_scenes} | "
+              f"✅ {success} ⏭️ {skipped} ❌ {failed_dl + failed_proc} | "
+              f"{rate:5.1f}/min | ETA: {eta_minutes:4.0f}m", 
+              end='', flush=True)
     
     def _log_progress(self):
         """Log progress to file (for background mode)."""
-        with self.lock:
-            if not self.logger:
-                return
-                
-            elapsed = time.time() - self.start_time
-            rate = self.completed / elapsed * 60 if elapsed > 0 else 0
-            percentage = self.completed / self.total_scenes * 100
-            
-            self.logger.info(
-                f"Progress: {percentage:.1f}% ({self.completed}/{self.total_scenes}) | "
-                f"Success: {self.success_count}, Skipped: {self.skipped_count}, "
-                f"Failed: {len(self.failed_downloads + self.failed_processing)} | "
-                f"Rate: {rate:.1f}/min"
-            )
+        if not self.logger:
+            return
+        
+        completed, success, skipped, failed_dl, failed_proc = self._snapshot()
+        elapsed = time.time() - self.start_time
+        rate = completed / elapsed * 60 if elapsed > 0 else 0
+        percentage = completed / self.total_scenes * 100
+        
+        self.logger.info(
+            f"Progress: {percentage:.1f}% ({completed}/{self.total_scenes}) | "
+            f"Success: {success}, Skipped: {skipped}, "
+            f"Failed: {failed_dl + failed_proc} | "
+            f"Rate: {rate:.1f}/min"
+        )
     
     def print_final_summary(self, interrupted=False):
         """Print final summary."""
-        with self.lock:
-            total_time = time.time() - self.start_time
-            
-            summary_lines = []
-            summary_lines.append("=" * 80)
-            if interrupted:
-                summary_lines.append("🛑 PROCESSING INTERRUPTED")
-            else:
-                summary_lines.append("🏁 PROCESSING COMPLETE")
-            summary_lines.append("=" * 80)
-            summary_lines.append(f"Total time: {total_time/60:.1f} minutes")
-            summary_lines.append(f"Scenes processed: {self.completed}")
-            summary_lines.append(f"Successful: {self.success_count}")
-            summary_lines.append(f"Skipped (already complete): {self.skipped_count}")
-            summary_lines.append(f"Failed downloads: {len(self.failed_downloads)}")
-            summary_lines.append(f"Failed processing: {len(self.failed_processing)}")
-            
-            actual_processed = self.success_count + self.skipped_count + len(self.failed_downloads) + len(self.failed_processing)
-            if actual_processed > 0:
-                summary_lines.append(f"Success rate: {(self.success_count + self.skipped_count)/actual_processed*100:.1f}%")
-                if actual_processed > self.skipped_count:
-                    summary_lines.append(f"Average time per scene: {total_time/(actual_processed - self.skipped_count):.1f} seconds")
-            
-            if self.failed_downloads:
-                summary_lines.append(f"\n❌ Failed downloads: {', '.join(self.failed_downloads[:10])}")
-                if len(self.failed_downloads) > 10:
-                    summary_lines.append(f"   ... and {len(self.failed_downloads) - 10} more")
-            
-            if self.failed_processing:
-                summary_lines.append(f"\n❌ Failed processing: {', '.join(self.failed_processing[:10])}")
-                if len(self.failed_processing) > 10:
-                    summary_lines.append(f"   ... and {len(self.failed_processing) - 10} more")
-            
-            # Print and log the summary
-            summary_text = "\n".join(summary_lines)
-            print(summary_text)
-            
-            if self.logger:
-                for line in summary_lines:
-                    if line.strip():
-                        self.logger.info(line.strip())
+        total_time = time.time() - self.start_time
+        completed, success, skipped, failed_dl, failed_proc = self._snapshot()
+        
+        summary_lines = []
+        summary_lines.append("=" * 80)
+        if interrupted:
+            summary_lines.append("🛑 PROCESSING INTERRUPTED")
+        else:
+            summary_lines.append("🏁 PROCESSING COMPLETE")
+        summary_lines.append("=" * 80)
+        summary_lines.append(f"Total time: {total_time/60:.1f} minutes")
+        summary_lines.append(f"Scenes processed: {completed}")
+        summary_lines.append(f"Successful: {success}")
+        summary_lines.append(f"Skipped (already complete): {skipped}")
+        summary_lines.append(f"Failed downloads: {failed_dl}")
+        summary_lines.append(f"Failed processing: {failed_proc}")
+        
+        actual_processed = success + skipped + failed_dl + failed_proc
+        if actual_processed > 0:
+            summary_lines.append(f"Success rate: {(success + skipped)/actual_processed*100:.1f}%")
+            if actual_processed > skipped:
+                summary_lines.append(f"Average time per scene: {total_time/(actual_processed - skipped):.1f} seconds")
+        
+        if failed_dl:
+            summary_lines.append(f"\n❌ Failed downloads: {', '.join(islice(self.failed_downloads, 10))}")
+            if failed_dl > 10:
+                summary_lines.append(f"   ... and {failed_dl - 10} more")
+        
+        if failed_proc:
+            summary_lines.append(f"\n❌ Failed processing: {', '.join(islice(self.failed_processing, 10))}")
+            if failed_proc > 10:
+                summary_lines.append(f"   ... and {failed_proc - 10} more")
+        
+        # Print and log the summary
+        summary_text = "\n".join(summary_lines)
+        print(summary_text)
+        
+        if self.logger:
+            for line in summary_lines:
+                if line.strip():
+                    self.logger.info(line.strip())
     
     def get_stats(self):
         """Get current statistics."""
-        with self.lock:
-            return {
-                'completed': self.completed,
-                'success_count': self.success_count,
-                'skipped_count': self.skipped_count,
-                'failed_downloads': self.failed_downloads.copy(),
-                'failed_processing': self.failed_processing.copy(),
-                'successful_scenes': self.successful_scenes.copy()
-            }
+        completed, success, skipped, _, _ = self._snapshot()
+        return {
+            'completed': completed,
+            'success_count': success,
+            'skipped_count': skipped,
+            'failed_downloads': list(self.failed_downloads),
+            'failed_processing': list(self.failed_processing),
+            'successful_scenes': self._successful_scenes[:self._successful_count]
+        }
+
+
+# Directories kept in a processed scene
+KEPT_SCENE_DIRS = ('highres_depth', 'ultrawide', 'ultrawide_intrinsics')
 
 
-def validate_scene_download(scene_path, assets):
+def _list_scene_files(scene_path):
+    """
+    List each kept scene directory with a single os.scandir pass.
+    Returns {dir_name: [os.DirEntry, ...]} for the kept directories that exist,
+    so validation, cleaning and subsampling can share one listing.
+    """
+    scene_files = {}
+    for dir_name in KEPT_SCENE_DIRS:
+        try:
+            with os.scandir(os.path.join(scene_path, dir_name)) as it:
+                scene_files[dir_name] = list(it)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+    return scene_files
+
+
+# Per-scene record of a successful validation, see write_scene_manifest()
+SCENE_MANIFEST_NAME = '.arkitscenes_manifest.json'
+
+
+def _scene_dir_mtimes(scene_path):
+    """Modification times (ns) of the scene root and kept directories; None if missing."""
+    mtimes = {}
+    for name in ('.',) + KEPT_SCENE_DIRS:
+        try:
+            mtimes[name] = os.stat(os.path.join(scene_path, name)).st_mtime_ns
+        except FileNotFoundError:
+            mtimes[name] = None
+    return mtimes
+
+
+def write_scene_manifest(scene_path, assets, subsample_n, scene_files):
+    """
+    Record that a scene processed by this run validated as complete, keyed on its directory mtimes.
+    Any file added to or removed from the scene root or a kept directory changes
+    an mtime and so invalidates the manifest.
+    """
+    manifest_path = os.path.join(scene_path, SCENE_MANIFEST_NAME)
+    try:
+        # Create the file before taking mtimes: adding it changes the root's mtime,
+        # rewriting it in place afterwards does not
+        open(manifest_path, 'a').close()
+        manifest = {
+            'dir_mtimes': _scene_dir_mtimes(scene_path),
+            'file_counts': {name: len(entries) for name, entries in scene_files.items()},
+            'assets': sorted(assets),
+            'subsample_n': subsample_n,
+        }
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+    except OSError:
+        pass  # Only an optimisation; read-only data is validated every run
+
+
+def _has_highres_frames(scene_path, min_files=10):
+    """Check highres_depth holds at least min_files PNGs (validate_scene_download's minimum)."""
+    count = 0
+    try:
+        with os.scandir(os.path.join(scene_path, 'highres_depth')) as it:
+            for entry in it:
+                if entry.name.endswith('.png'):
+                    count += 1
+                    if count >= min_files:
+                        return True
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    return False
+
+
+def is_scene_manifest_current(video_id, scene_path, download_dir, assets, subsample_n):
+    """
+    Check for a manifest showing the scene was validated and hasn't changed since.
+    The highres_depth checks stay authoritative: the scene must still be listed
+    with highres depth in metadata.csv and still have its frames on disk,
+    whatever the manifest says.
+    """
+    if 'highres_depth' in assets and not (has_highres_depth_available(video_id, download_dir)
+                                          and _has_highres_frames(scene_path)):
+        return False
+    
+    try:
+        with open(os.path.join(scene_path, SCENE_MANIFEST_NAME), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    
+    return (manifest.get('subsample_n', 0) >= subsample_n and
+            set(assets) <= set(manifest.get('assets', ())) and
+            manifest.get('dir_mtimes') == _scene_dir_mtimes(scene_path))
+
+
+def remove_scene_manifest(scene_path):
+    """Invalidate a scene's manifest (e.g. before redownloading it)."""
+    try:
+        os.unlink(os.path.join(scene_path, SCENE_MANIFEST_NAME))
+    except FileNotFoundError:
+        pass
+
+
+# Zip archives of one scene tested concurrently by validate_scene_download()
+MAX_ZIP_CHECKS = 4
+
+
+def check_zip_file(zip_file):
+    """
+    Check a zip file's integrity. Returns None if intact, else a description for reporting.
+    A passing check leaves a '<name>.zip.ok' marker so later runs skip re-reading
+    (and re-CRCing) the archive until the zip itself is modified. Markers outliving
+    their zip are removed by clean_scene_directories().
+    """
+    zip_file = Path(zip_file)
+    marker = zip_file.with_name(zip_file.name + '.ok')
+    try:
+        if marker.stat().st_mtime_ns >= zip_file.stat().st_mtime_ns:
+            return None
+    except FileNotFoundError:
+        pass
+    
+    try:
+        with zipfile.ZipFile(zip_file, 'r') as zf:
+            # testzip() streams every member through zlib's CRC32
+            bad_file = zf.testzip()
+    except (zipfile.BadZipFile, zipfile.LargeZipFile):
+        return zip_file.name
+    
+    if bad_file:
+        return f"{zip_file.name} (bad file: {bad_file})"
+    
+    try:
+        marker.touch()
+    except OSError:
+        pass  # Read-only data is fine, we just re-check next time
+    return None
+
+
+def validate_scene_download(scene_path, assets, scene_files=None):
     """
     Validate that all required files for a scene are downloaded and intact.
     Returns (status, details) where status is one of:
@@ -284,8 +582,12 @@ def validate_scene_download(scene_path, assets):
     - 'missing_intrinsics': Has depth/wide but missing intrinsics
     - 'missing_other': Missing other required files
     - 'corrupted': Has corrupted files
+    
+    scene_files is an optional listing from _list_scene_files() to reuse.
     """
     scene_path = Path(scene_path)
+    if scene_files is None:
+        scene_files = _list_scene_files(scene_path)
     missing_files = []
     corrupted_files = []
     
@@ -304,33 +606,31 @@ def validate_scene_download(scene_path, assets):
                 expected_items[asset] = 'directory'
     
     for item_name, item_type in expected_items.items():
-        item_path = scene_path / item_name
-        
-        if not item_path.exists():
+        # Kept directories are already listed; only other assets need a stat
+        if item_name not in scene_files and not (scene_path / item_name).exists():
             missing_files.append(item_name)
             continue
             
         if item_type == 'directory':
             # Check if directory has reasonable number of files
             if item_name in ['highres_depth', 'ultrawide']:
-                files = list(item_path.glob('*.png'))
-                if len(files) < 10:  # Arbitrary minimum
-                    missing_files.append(f"{item_name} (only {len(files)} files)")
+                file_count = sum(1 for e in scene_files[item_name] if e.name.endswith('.png'))
+                if file_count < 10:  # Arbitrary minimum
+                    missing_files.append(f"{item_name} (only {file_count} files)")
             elif item_name == 'ultrawide_intrinsics':
-                files = list(item_path.glob('*.pincam'))
-                if len(files) < 10:  # Arbitrary minimum
-                    missing_files.append(f"{item_name} (only {len(files)} files)")
-    
-    # Check for zip files that might be corrupted
-    for zip_file in scene_path.glob('*.zip'):
-        try:
-            with zipfile.ZipFile(zip_file, 'r') as zf:
-                # Test the zip file
-                bad_file = zf.testzip()
-                if bad_file:
-                    corrupted_files.append(f"{zip_file.name} (bad file: {bad_file})")
-        except (zipfile.BadZipFile, zipfile.LargeZipFile):
-            corrupted_files.append(zip_file.name)
+                file_count = sum(1 for e in scene_files[item_name] if e.name.endswith('.pincam'))
+                if file_count < 10:  # Arbitrary minimum
+                    missing_files.append(f"{item_name} (only {file_count} files)")
+    
+    # Check for zip files that might be corrupted. zlib releases the GIL while
+    # CRCing, so several archives are tested concurrently.
+    zip_files = list(scene_path.glob('*.zip'))
+    if len(zip_files) > 1:
+        with ThreadPoolExecutor(max_workers=min(len(zip_files), MAX_ZIP_CHECKS)) as executor:
+            problems = list(executor.map(check_zip_file, zip_files))
+    else:
+        problems = [check_zip_file(zip_file) for zip_file in zip_files]
+    corrupted_files.extend(problem for problem in problems if problem)
     
     # Determine status
     if corrupted_files:
@@ -338,8 +638,8 @@ def validate_scene_download(scene_path, assets):
     
     if missing_files:
         # Check if only intrinsics are missing but we have depth and wide
-        has_depth = (scene_path / 'highres_depth').exists()
-        has_wide = (scene_path / 'ultrawide').exists()
+        has_depth = 'highres_depth' in scene_files
+        has_wide = 'ultrawide' in scene_files
         missing_intrinsics = 'ultrawide_intrinsics' in missing_files
         
         if has_depth and has_wide and missing_intrinsics and len(missing_files) == 1:
@@ -350,7 +650,13 @@ def validate_scene_download(scene_path, assets):
     return 'complete', {}
 
 
-def should_skip_scene(video_id, split, download_dir, assets, subsample_n, quiet=True):
+@lru_cache(maxsize=None)
+def _raw_root(download_dir):
+    """Path of the raw/ tree under download_dir, built once per directory."""
+    return Path(download_dir) / "raw"
+
+
+def should_skip_scene(video_id, split, download_dir, assets, subsample_n, quiet=True, scene_files=None):
     """
     Check if a scene should be skipped because it's already complete.
     Returns (action, reason) where action is one of:
@@ -359,8 +665,15 @@ def should_skip_scene(video_id, split, download_dir, assets, subsample_n, quiet=
     - 'redownload': Scene has depth/wide but missing intrinsics, redownload
     - 'remove': Scene is missing highres_depth (should be deleted)
     - 'process': Scene needs processing for other reasons
+    
+    scene_files is an optional listing from _list_scene_files() to reuse. Callers that
+    pass one are expected to have checked is_scene_manifest_current() already.
     """
-    scene_path = Path(download_dir) / "raw" / split / video_id
+    scene_path = _raw_root(download_dir) / split / video_id
+    
+    # Scenes validated on an earlier run are skipped without a full listing or zip I/O
+    if scene_files is None and is_scene_manifest_current(video_id, scene_path, download_dir, assets, subsample_n):
+        return 'skip', "Scene is complete (cached)"
     
     # First check if this scene has highres_depth available
     if 'highres_depth' in assets and not has_highres_depth_available(video_id, download_dir):
@@ -372,8 +685,11 @@ def should_skip_scene(video_id, split, download_dir, assets, subsample_n, quiet=
     if not scene_path.exists():
         return 'process', "Scene directory doesn't exist"
     
+    if scene_files is None:
+        scene_files = _list_scene_files(scene_path)
+    
     # Check if download is complete
-    status, details = validate_scene_download(scene_path, assets)
+    status, details = validate_scene_download(scene_path, assets, scene_files)
     
     if status == 'corrupted':
         return 'process', f"Corrupted files: {', '.join(details['corrupted_files'])}"
@@ -392,42 +708,60 @@ def should_skip_scene(video_id, split, download_dir, assets, subsample_n, quiet=
     if subsample_n > 1:
         # Check if we have the expected number of subsampled files
         for dir_name in ["highres_depth", "ultrawide", "ultrawide_intrinsics"]:
-            dir_path = scene_path / dir_name
-            if not dir_path.exists():
+            if dir_name not in scene_files:
                 continue
                 
-            if dir_name == "ultrawide_intrinsics":
-                files = list(dir_path.glob('*.pincam'))
-            else:
-                files = list(dir_path.glob('*.png'))
+            suffix = '.pincam' if dir_name == "ultrawide_intrinsics" else '.png'
+            file_count = sum(1 for e in scene_files[dir_name] if e.name.endswith(suffix))
             
             # If we have a lot of files, subsampling probably hasn't been applied
-            if len(files) > 1000:  # Arbitrary threshold
+            if file_count > 1000:  # Arbitrary threshold
                 return 'process', f"Subsampling not applied to {dir_name}"
     
     return 'skip', "Scene is complete"
 
 
-def process_single_scene(args_tuple):
+def process_single_scene(video_id, split, redownload_attempt=0, *, download_dir, assets, subsample_n,
+                         execute, skip_download, force_reprocess, quiet):
     """
     Process a single scene: download, clean, and subsample.
-    This function is designed to be called by multiprocessing workers.
+    The keyword-only settings are the same for the whole batch; workers get them
+    bound once by _worker_init() and are then called through _run_scene().
+    Redownload attempts always download and never skip, so skip_download and
+    force_reprocess only apply to attempt 0.
+    On a shutdown request the scene stops before its next expensive step and
+    reports Phase.CANCELLED, which is not counted as a failure.
     """
-    video_id, split, download_dir, assets, subsample_n, execute, skip_download, force_reprocess, quiet, redownload_attempt = args_tuple
+    cancelled = {
+        'video_id': video_id,
+        'success': False,
+        'error': 'Cancelled by shutdown request',
+        'phase': Phase.CANCELLED
+    }
+    if _shutdown_requested():
+        return cancelled
     
     try:
-        scene_path = Path(download_dir) / "raw" / split / video_id
+        scene_path = _raw_root(download_dir) / split / video_id
+        
+        # One directory listing shared by validation, cleaning and subsampling
+        scene_files = None
         
         # Check if we should skip this scene
         if not force_reprocess and redownload_attempt == 0:
-            action, reason = should_skip_scene(video_id, split, download_dir, assets, subsample_n, quiet)
+            if is_scene_manifest_current(video_id, scene_path, download_dir, assets, subsample_n):
+                action, reason = 'skip', "Scene is complete (cached)"
+            else:
+                scene_files = _list_scene_files(scene_path)
+                action, reason = should_skip_scene(video_id, split, download_dir, assets, subsample_n, quiet,
+                                                   scene_files)
             
             if action == 'skip':
                 return {
                     'video_id': video_id,
                     'success': True,
                     'error': None,
-                    'phase': 'skipped',
+                    'phase': Phase.SKIPPED,
                     'reason': reason
                 }
             elif action == 'skip_no_highres':
@@ -435,7 +769,7 @@ def process_single_scene(args_tuple):
                     'video_id': video_id,
                     'success': True,
                     'error': None,
-                    'phase': 'skipped_no_highres',
+                    'phase': Phase.SKIPPED_NO_HIGHRES,
                     'reason': reason
                 }
             elif action == 'remove':
@@ -445,7 +779,7 @@ def process_single_scene(args_tuple):
                         'video_id': video_id,
                         'success': True,
                         'error': None,
-                        'phase': 'removed_no_highres',
+                        'phase': Phase.REMOVED_NO_HIGHRES,
                         'reason': reason
                     }
                 else:
@@ -453,7 +787,7 @@ def process_single_scene(args_tuple):
                         'video_id': video_id,
                         'success': False,
                         'error': 'Failed to remove scene directory',
-                        'phase': 'removal_failed'
+                        'phase': Phase.REMOVAL_FAILED
                     }
             elif action == 'redownload':
                 # This scene has depth/wide but missing intrinsics - redownload
@@ -466,20 +800,20 @@ def process_single_scene(args_tuple):
                 #         'video_id': video_id,
                 #         'success': False,
                 #         'error': 'Scene removed - missing intrinsics after redownload',
-                #         'phase': 'removed'
+                #         'phase': Phase.REMOVED
                 #     }
                 # else:
                 #     return {
                 #         'video_id': video_id,
                 #         'success': False,
                 #         'error': 'Failed to remove scene directory',
-                #         'phase': 'removal_failed'
+                #         'phase': Phase.REMOVAL_FAILED
                 #     }
                 return {
                     'video_id': video_id,
                     'success': False,
                     'error': 'Scene has missing intrinsics after redownload - not removed',
-                    'phase': 'missing_intrinsics'
+                    'phase': Phase.MISSING_INTRINSICS
                 }
         
         # Download phase (always download for redownload_attempt > 0 or when not skipping)
@@ -488,7 +822,12 @@ def process_single_scene(args_tuple):
             # if redownload_attempt > 0 and scene_path.exists():
             #     remove_scene_directory(scene_path, quiet)
             
-            download_success = run_download(video_id, split, download_dir, assets, quiet)
+            remove_scene_manifest(scene_path)
+            download_success, timed_out = run_download(video_id, split, download_dir, assets, quiet)
+            scene_files = None  # Any earlier listing is stale now
+            if _shutdown_requested():
+                # Assets may have been skipped; the next run validates the scene again
+                return cancelled
             if not download_success:
                 if redownload_attempt > 0:
                     # Second download failed - remove the scene
@@ -496,20 +835,21 @@ def process_single_scene(args_tuple):
                     return {
                         'video_id': video_id,
                         'success': False,
-                        'error': 'Redownload failed - scene not removed',
-                        'phase': 'redownload_failed'
+                        'error': 'Redownload failed - scene not removed' + _timeout_note(timed_out),
+                        'phase': Phase.REDOWNLOAD_FAILED
                     }
                 else:
                     return {
                         'video_id': video_id,
                         'success': False,
-                        'error': 'Download failed',
-                        'phase': 'download'
+                        'error': 'Download failed' + _timeout_note(timed_out),
+                        'phase': Phase.DOWNLOAD
                     }
             
             # After successful download, check if intrinsics are now present
             if redownload_attempt > 0:
-                status, details = validate_scene_download(scene_path, assets)
+                scene_files = _list_scene_files(scene_path)
+                status, details = validate_scene_download(scene_path, assets, scene_files)
                 if status == 'missing_intrinsics':
                     # Still missing intrinsics after redownload - remove the scene
                     # remove_scene_directory(scene_path, quiet)
@@ -517,24 +857,35 @@ def process_single_scene(args_tuple):
                         'video_id': video_id,
                         'success': False,
                         'error': 'Scene has missing intrinsics after redownload - not removed',
-                        'phase': 'removed_missing_intrinsics'
+                        'phase': Phase.REMOVED_MISSING_INTRINSICS
                     }
         
         # Processing phase
-        process_success = run_clean_subsample(scene_path, subsample_n, execute, quiet)
+        if _shutdown_requested():
+            return cancelled
+        process_success = run_clean_subsample(scene_path, subsample_n, execute, quiet, scene_files)
         if not process_success:
             return {
                 'video_id': video_id,
                 'success': False,
                 'error': 'Processing failed',
-                'phase': 'processing'
+                'phase': Phase.PROCESSING
             }
         
+        # Dry runs (and --validate_only) leave the scene untouched, manifest included
+        if execute:
+            scene_files = _list_scene_files(scene_path)
+            action, _ = should_skip_scene(video_id, split, download_dir, assets, subsample_n, quiet, scene_files)
+            if action == 'skip':
+                write_scene_manifest(scene_path, assets, subsample_n, scene_files)
+            else:
+                remove_scene_manifest(scene_path)
+        
         return {
             'video_id': video_id,
             'success': True,
             'error': None,
-            'phase': 'completed'
+            'phase': Phase.COMPLETED
         }
         
     except Exception as e:
@@ -542,138 +893,196 @@ def process_single_scene(args_tuple):
             'video_id': video_id,
             'success': False,
             'error': str(e),
-            'phase': 'exception'
+            'phase': Phase.EXCEPTION
         }
 
 
+def _run_scene(video_id, split, redownload_attempt=0):
+    """Process a scene with the settings installed by _worker_init()."""
+    return _WORKER_STATE['scene_worker'](video_id, split, redownload_attempt)
+
+
+# Most scenes per first-pass task when nothing is downloaded (see main())
+SCENE_CHUNK_MAX = 32
+
+
+def _process_chunk_to_queue(chunk, result_q):
+    """
+    Process a chunk of (index, video_id, split) scenes in a worker, streaming each
+    (index, result) back through result_q as soon as that scene finishes.
+    """
+    for index, video_id, split in chunk:
+        result_q.put((index, _run_scene(video_id, split)))
+
+
+def _timeout_note(timed_out):
+    return f" (timed out: {', '.join(timed_out)})" if timed_out else ''
+
+
 def run_download(video_id, split, download_dir, assets, quiet=True):
-    """Download a scene using the download script with parallel asset downloads."""
-    # Use threading to download assets in parallel within the scene
-    from concurrent.futures import ThreadPoolExecutor, as_completed
+    """
+    Download a scene in-process using download_data, with parallel asset downloads.
+    Returns (success, timed_out_assets); the timeouts go into the scene's error
+    so they reach the run log even from a silenced worker.
+    """
+    global _asset_executor
     
     def download_asset(asset):
-        cmd = [
-            sys.executable, "download_data.py",
-            "--split", split,
-            "--video_id", video_id, 
-            "--download_dir", download_dir,
-            "--raw_dataset_assets", asset
-        ]
-        
+        if _shutdown_requested():
+            return False  # Not started; the caller reports the scene as cancelled
+        if download_data is None:
+            raise RuntimeError("download_data could not be imported (is pandas installed?)")
+        # False when curl or unzip failed; download_data reports those by return value
+        return download_data.download(split, video_id, download_dir, [asset])
+    
+    # Download assets in parallel on the process's long-lived pool (see _worker_init),
+    # limited to MAX_ASSET_DOWNLOADS concurrent downloads
+    executor = _asset_executor
+    futures = {executor.submit(download_asset, asset): asset for asset in assets}
+    results = []
+    timed_out = []
+    for future, asset in futures.items():
         try:
-            if quiet:
-                # Suppress output
-                result = subprocess.run(cmd, timeout=900,  # 15 min per asset
-                                      stdout=subprocess.DEVNULL, 
-                                      stderr=subprocess.DEVNULL)
-            else:
-                result = subprocess.run(cmd, timeout=900)
-            return result.returncode == 0
-        except subprocess.TimeoutExpired:
-            return False
-    
-    # Download assets in parallel using threads
-    with ThreadPoolExecutor(max_workers=min(len(assets), 4)) as executor:  # Limit to 4 concurrent downloads per scene
-        futures = {executor.submit(download_asset, asset): asset for asset in assets}
-        results = []
-        for future in as_completed(futures):
-            asset = futures[future]
-            try:
-                success = future.result()
-                results.append(success)
-                if not quiet and not success:
-                    print(f"Failed to download {asset} for {video_id}")
-            except Exception as e:
-                if not quiet:
-                    print(f"Exception downloading {asset} for {video_id}: {e}")
-                results.append(False)
+            success = future.result(timeout=900)  # 15 min per asset
+            results.append(success)
+        except FutureTimeoutError:
+            # Unlike a subprocess, a hung download thread can't be killed. Drop any of
+            # this scene's downloads that haven't started yet, and give later scenes
+            # a fresh pool so the hung thread doesn't keep holding one of its slots.
+            for pending in futures:
+                pending.cancel()
+            if executor is _asset_executor:
+                executor.shutdown(wait=False)
+                _asset_executor = _start_asset_executor()
+            if not quiet:
+                print(f"Timed out downloading {asset} for {video_id}")
+            timed_out.append(asset)
+            results.append(False)
+        except Exception as e:
+            if not quiet:
+                print(f"Exception downloading {asset} for {video_id}: {e}")
+            results.append(False)
     
-    # Return True only if all assets downloaded successfully
-    return all(results)
+    # Successful only if all assets downloaded successfully
+    return all(results), timed_out
 
 
-def run_clean_subsample(scene_path, subsample_n, execute=False, quiet=True):
+def run_clean_subsample(scene_path, subsample_n, execute=False, quiet=True, scene_files=None):
     """Clean and subsample a scene."""
+    if scene_files is None:
+        scene_files = _list_scene_files(scene_path)
+    
     # First, clean up directories and ensure matching files
-    if not clean_scene_directories(scene_path, execute, quiet):
+    # (this also drops removed files from scene_files)
+    if not clean_scene_directories(scene_path, execute, quiet, scene_files):
         return False
     
     # Now subsample if needed
     if subsample_n > 1:
-        return subsample_scene_files(scene_path, subsample_n, execute, quiet)
+        return subsample_scene_files(scene_path, subsample_n, execute, quiet, scene_files)
     
     return True
 
 
-def subsample_scene_files(scene_path, subsample_n, execute=False, quiet=True):
+def subsample_scene_files(scene_path, subsample_n, execute=False, quiet=True, scene_files=None):
     """Keep every Nth file in the kept directories."""
     scene_path = Path(scene_path)
+    if scene_files is None:
+        scene_files = _list_scene_files(scene_path)
     
     # Only subsample the image directories, not intrinsics
     for dir_name in ["highres_depth", "ultrawide"]:
-        dir_path = scene_path / dir_name
-        if not dir_path.exists():
+        if dir_name not in scene_files:
             continue
         
-        # Get sorted files
-        files = sorted([f for f in dir_path.iterdir() if f.suffix == '.png'])
+        # Get sorted files (all in one directory, so sorting by name orders them as paths)
+        files = [e for e in scene_files[dir_name] if e.name.endswith('.png')]
+        files.sort(key=lambda e: e.name)
         
-        # Keep every Nth file
-        files_to_keep = files[::subsample_n]
-        files_to_remove = [f for f in files if f not in files_to_keep]
+        # Keep every Nth file (indices 0, N, 2N, ...)
+        keep_count = len(range(0, len(files), subsample_n))
         
         if not quiet:
-            print(f"{dir_name}: {len(files)} files -> keeping {len(files_to_keep)} (1/{subsample_n})")
+            print(f"{dir_name}: {len(files)} files -> keeping {keep_count} (1/{subsample_n})")
         
-        # Remove files
-        for file_path in files_to_remove:
-            if execute:
-                file_path.unlink()
-            elif not quiet:
-                print(f"[DRY] Would remove: {file_path.name}")
+        # Remove files: everything but indices 0, N, 2N, ...
+        files_to_remove = files
+        del files_to_remove[::subsample_n]
+        if execute:
+            remove_files([e.path for e in files_to_remove])
+        elif not quiet:
+            for entry in files_to_remove:
+                print(f"[DRY] Would remove: {entry.name}")
     
     # For intrinsics, keep matching files (already handled by clean_scene_directories)
     # But if subsampling, we need to subsample intrinsics too to match
-    intrinsics_dir = scene_path / "ultrawide_intrinsics"
-    if intrinsics_dir.exists() and subsample_n > 1:
-        intrinsics_files = sorted([f for f in intrinsics_dir.iterdir() if f.suffix == '.pincam'])
-        intrinsics_to_keep = intrinsics_files[::subsample_n]
-        intrinsics_to_remove = [f for f in intrinsics_files if f not in intrinsics_to_keep]
+    if "ultrawide_intrinsics" in scene_files and subsample_n > 1:
+        intrinsics_files = [e for e in scene_files["ultrawide_intrinsics"] if e.name.endswith('.pincam')]
+        intrinsics_files.sort(key=lambda e: e.name)
+        keep_count = len(range(0, len(intrinsics_files), subsample_n))
         
         if not quiet:
-            print(f"ultrawide_intrinsics: {len(intrinsics_files)} files -> keeping {len(intrinsics_to_keep)} (1/{subsample_n})")
+            print(f"ultrawide_intrinsics: {len(intrinsics_files)} files -> keeping {keep_count} (1/{subsample_n})")
         
-        for file_path in intrinsics_to_remove:
-            if execute:
-                file_path.unlink()
-            elif not quiet:
-                print(f"[DRY] Would remove: {file_path.name}")
+        intrinsics_to_remove = intrinsics_files
+        del intrinsics_to_remove[::subsample_n]
+        if execute:
+            remove_files([e.path for e in intrinsics_to_remove])
+        elif not quiet:
+            for entry in intrinsics_to_remove:
+                print(f"[DRY] Would remove: {entry.name}")
     
     return True
 
 
-def clean_scene_directories(scene_path, execute=False, quiet=True):
-    """Clean scene directories: keep only highres_depth, ultrawide, ultrawide_intrinsics, and ensure matching files."""
+def _file_stems(entries, suffix):
+    """Yield the name without suffix of each entry ending in suffix."""
+    cut = -len(suffix)
+    return (entry.name[:cut] for entry in entries if entry.name.endswith(suffix))
+
+
+def clean_scene_directories(scene_path, execute=False, quiet=True, scene_files=None):
+    """
+    Clean scene directories: keep only highres_depth, ultrawide, ultrawide_intrinsics, and ensure matching files.
+    When given a scene_files listing from _list_scene_files(), it is used instead of rescanning
+    and, in execute mode, updated in place to drop the removed files.
+    """
     scene_path = Path(scene_path)
+    if scene_files is None:
+        scene_files = _list_scene_files(scene_path)
     
     # Directories to keep
     keep_dirs = {'highres_depth', 'ultrawide', 'ultrawide_intrinsics'}
     
-    # Remove unwanted directories
-    for item in scene_path.iterdir():
-        if item.is_dir() and item.name not in keep_dirs:
-            if execute:
-                import shutil
-                shutil.rmtree(item)
-                if not quiet:
-                    print(f"🗑️  Removed directory: {item.name}")
-            elif not quiet:
-                print(f"[DRY] Would remove directory: {item.name}")
+    # Remove unwanted directories. DirEntry.is_dir() answers from the readdir
+    # entry type, so this costs no stat per entry; symlinks are left alone
+    # (rmtree refuses them anyway).
+    with os.scandir(scene_path) as it:
+        root_entries = list(it)
+    unwanted_dirs = [entry for entry in root_entries
+                     if entry.name not in keep_dirs and entry.is_dir(follow_symlinks=False)]
+    for entry in unwanted_dirs:
+        if execute:
+            shutil.rmtree(entry.path)
+            if not quiet:
+                print(f"🗑️  Removed directory: {entry.name}")
+        elif not quiet:
+            print(f"[DRY] Would remove directory: {entry.name}")
+    
+    # Drop check_zip_file() markers whose zip is gone (unzipped without keep_zip)
+    if execute:
+        root_names = {entry.name for entry in root_entries}
+        for name in root_names:
+            if name.endswith('.zip.ok') and name[:-len('.ok')] not in root_names:
+                try:
+                    os.unlink(os.path.join(scene_path, name))
+                except FileNotFoundError:
+                    pass
     
     # Check if all required directories exist
     missing_dirs = []
     for dir_name in keep_dirs:
-        if not (scene_path / dir_name).exists():
+        if dir_name not in scene_files:
             missing_dirs.append(dir_name)
     
     if missing_dirs:
@@ -681,44 +1090,49 @@ def clean_scene_directories(scene_path, execute=False, quiet=True):
             print(f"⚠️  Missing required directories: {', '.join(missing_dirs)}")
         return False
     
-    # Get file sets for each directory
-    file_sets = {}
-    for dir_name in keep_dirs:
-        dir_path = scene_path / dir_name
-        if dir_name == 'ultrawide_intrinsics':
-            files = {f.stem for f in dir_path.glob('*.pincam')}
-        else:
-            files = {f.stem for f in dir_path.glob('*.png')}
-        file_sets[dir_name] = files
+    suffixes = {dir_name: '.pincam' if dir_name == 'ultrawide_intrinsics' else '.png'
+                for dir_name in keep_dirs}
     
-    # Find common filenames across all directories
-    common_files = set.intersection(*file_sets.values())
+    # Find common filenames across all directories: build a set from the smallest
+    # directory only, then narrow it by streaming the other directories' names
+    probe_order = sorted(keep_dirs, key=lambda dir_name: len(scene_files[dir_name]))
+    common_files = set(_file_stems(scene_files[probe_order[0]], suffixes[probe_order[0]]))
+    for dir_name in probe_order[1:]:
+        common_files = {stem for stem in _file_stems(scene_files[dir_name], suffixes[dir_name])
+                        if stem in common_files}
     
     if not quiet:
-        print(f"📊 File counts - highres_depth: {len(file_sets['highres_depth'])}, "
-              f"ultrawide: {len(file_sets['ultrawide'])}, "
-              f"ultrawide_intrinsics: {len(file_sets['ultrawide_intrinsics'])}")
+        counts = {dir_name: sum(1 for _ in _file_stems(scene_files[dir_name], suffixes[dir_name]))
+                  for dir_name in keep_dirs}
+        print(f"📊 File counts - highres_depth: {counts['highres_depth']}, "
+              f"ultrawide: {counts['ultrawide']}, "
+              f"ultrawide_intrinsics: {counts['ultrawide_intrinsics']}")
         print(f"✅ Common files across all directories: {len(common_files)}")
     
     # Remove files that don't have matches in all directories
     for dir_name in keep_dirs:
-        dir_path = scene_path / dir_name
         files_to_remove = []
+        remaining = []
+        
+        for entry in scene_files[dir_name]:
+            # Name-only stem and dirent file type: no Path or stat per entry
+            if entry.is_file(follow_symlinks=False) and entry.name.rsplit('.', 1)[0] not in common_files:
+                files_to_remove.append(entry)
+            else:
+                remaining.append(entry)
         
-        for file_path in dir_path.iterdir():
-            if file_path.is_file():
-                if file_path.stem not in common_files:
-                    files_to_remove.append(file_path)
+        if execute:
+            scene_files[dir_name] = remaining
         
         if files_to_remove:
             if not quiet:
                 print(f"🗑️  Removing {len(files_to_remove)} unmatched files from {dir_name}")
             
-            for file_path in files_to_remove:
-                if execute:
-                    file_path.unlink()
-                elif not quiet:
-                    print(f"[DRY] Would remove: {file_path.name}")
+            if execute:
+                remove_files([entry.path for entry in files_to_remove])
+            elif not quiet:
+                for entry in files_to_remove:
+                    print(f"[DRY] Would remove: {entry.name}")
     
     return True
 
@@ -733,67 +1147,204 @@ def check_scene_subfolders_empty(scene_path, assets):
     
     for asset in assets:
         if asset in ['highres_depth', 'ultrawide', 'ultrawide_intrinsics']:
-            dir_path = scene_path / asset
-            if dir_path.exists():
-                files = list(dir_path.glob('*'))
-                if not files:
-                    empty_dirs.append(asset)
+            # Stop at the first entry; like glob('*'), hidden files don't count
+            try:
+                with os.scandir(scene_path / asset) as it:
+                    is_empty = not any(not entry.name.startswith('.') for entry in it)
+            except FileNotFoundError:
+                continue
+            except NotADirectoryError:
+                is_empty = True
+            if is_empty:
+                empty_dirs.append(asset)
     
     return empty_dirs
 
 
+# Scene directories scanned concurrently by scan_empty_subfolders()
+MAX_EMPTY_DIR_CHECKS = 32
+
+
+def scan_empty_subfolders(scene_paths, assets):
+    """
+    Run check_scene_subfolders_empty() over many scenes.
+    Returns the empty directory lists in the order of scene_paths.
+    """
+    scene_paths = list(scene_paths)
+    if len(scene_paths) <= 1:
+        return [check_scene_subfolders_empty(path, assets) for path in scene_paths]
+    # Each check is a few scandir calls that release the GIL, so threads
+    # overlap the stat round-trips on slow or network filesystems
+    with ThreadPoolExecutor(max_workers=min(len(scene_paths), MAX_EMPTY_DIR_CHECKS)) as executor:
+        return list(executor.map(partial(check_scene_subfolders_empty, assets=assets), scene_paths))
+
+
+def _metadata_file(download_dir):
+    return _raw_root(download_dir) / "metadata.csv"
+
+
+# Spellings of a true is_in_upsampling value, matched exactly instead of lower()-ing each row
+_TRUE_STRS = frozenset({'true', 'True', 'TRUE'})
+
+
+@lru_cache(maxsize=4)
+def _load_highres_map(metadata_file, mtime_ns):
+    """
+    Parse metadata.csv into {video_id: has_highres_depth}. Cached per file version
+    (mtime_ns is part of the key), so repeated lookups don't re-read the file.
+    """
+    # is_in_upsampling indicates if the scene has highres_depth
+    if pd is None:
+        highres_map = {}
+        with open(metadata_file, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                # The first row for a video wins, as in a top-down scan
+                highres_map.setdefault(row['video_id'], row['is_in_upsampling'] in _TRUE_STRS)
+        return highres_map
+    
+    df = pd.read_csv(metadata_file, usecols=['video_id', 'is_in_upsampling'],
+                     dtype={'video_id': str, 'is_in_upsampling': str})
+    df = df.drop_duplicates('video_id')
+    return dict(zip(df['video_id'], df['is_in_upsampling'].isin(_TRUE_STRS)))
+
+
+def _highres_map(metadata_file):
+    """Cached {video_id: has_highres_depth} for metadata_file; raises if it can't be read."""
+    return _load_highres_map(str(metadata_file), os.stat(metadata_file).st_mtime_ns)
+
+
+def load_highres_map(download_dir):
+    """
+    Read metadata.csv once into {video_id: has_highres_depth} for handing to workers.
+    Returns None if there is no metadata yet, so lookups keep checking the file.
+    """
+    metadata_file = _metadata_file(download_dir)
+    if not metadata_file.exists():
+        return None
+    
+    try:
+        return _highres_map(metadata_file)
+    except Exception:
+        # If we can't parse the metadata, assume not available to be safe
+        return {}
+
+
 def has_highres_depth_available(video_id, download_dir):
     """Check if a scene has high-resolution depth data available."""
-    metadata_file = Path(download_dir) / "raw" / "metadata.csv"
+    highres_map = _WORKER_STATE.get('highres_map')
+    if highres_map is not None:
+        return highres_map.get(str(video_id), False)
+    
+    metadata_file = _metadata_file(download_dir)
     if not metadata_file.exists():
         return True  # Can't check, assume available (will be downloaded)
     
     try:
-        import csv
-        with open(metadata_file, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row['video_id'] == str(video_id):
-                    # is_in_upsampling indicates if the scene has highres_depth
-                    return row['is_in_upsampling'].lower() == 'true'
-        
-        # Video ID not found in metadata
-        return False
+        # Video IDs not found in metadata have no highres depth
+        return _highres_map(metadata_file).get(str(video_id), False)
     except Exception:
         # If we can't parse the metadata, assume not available to be safe
         return False
 
 
+# shutil.rmtree's error hook was renamed in Python 3.12; onerror still works there but warns
+_RMTREE_ERROR_HOOK = 'onexc' if sys.version_info >= (3, 12) else 'onerror'
+
+
+def _empty_large_subdirs(scene_path):
+    """Unlink the files of big asset directories with remove_files() ahead of rmtree."""
+    with os.scandir(scene_path) as it:
+        subdirs = [entry.path for entry in it if entry.is_dir(follow_symlinks=False)]
+    for subdir in subdirs:
+        with os.scandir(subdir) as it:
+            files = [entry.path for entry in it if not entry.is_dir(follow_symlinks=False)]
+        if len(files) >= PARALLEL_UNLINK_MIN_FILES:
+            remove_files(files)
+
+
 def remove_scene_directory(scene_path, quiet=True):
     """Remove a scene directory."""
     scene_path = Path(scene_path)
-    if scene_path.exists():
-        try:
-            import shutil
-            shutil.rmtree(scene_path)
-            if not quiet:
-                print(f"🗑️  Removed scene directory: {scene_path.name}")
-            return True
-        except Exception as e:
-            if not quiet:
-                print(f"❌ Failed to remove scene directory {scene_path.name}: {e}")
-            return False
+    if not scene_path.exists():
+        return True
+    
+    try:
+        _empty_large_subdirs(scene_path)
+    except OSError:
+        pass  # rmtree below removes, and reports, whatever is left
+    
+    # Collect failures instead of aborting, so everything removable still goes
+    errors = []
+    
+    def record_error(func, path, exc):
+        errors.append(exc if isinstance(exc, BaseException) else exc[1])
+    
+    shutil.rmtree(scene_path, **{_RMTREE_ERROR_HOOK: record_error})
+    if errors:
+        if not quiet:
+            print(f"❌ Failed to remove scene directory {scene_path.name}: {errors[0]}")
+        return False
+    if not quiet:
+        print(f"🗑️  Removed scene directory: {scene_path.name}")
     return True
 
 
+@lru_cache(maxsize=4)
+def _read_scenes_csv(csv_file):
+    """
+    Read the video_id and fold columns of a splits CSV, verbatim as strings:
+    a DataFrame, or a list of (video_id, fold) tuples without pandas.
+    """
+    if pd is None:
+        with open(csv_file, 'r', newline='') as f:
+            return [(row['video_id'], row['fold']) for row in csv.DictReader(f)]
+    return pd.read_csv(csv_file, usecols=['video_id', 'fold'], dtype=str, keep_default_na=False)
+
+
 def load_scenes_csv(csv_file, target_split=None):
-    """Load scenes from CSV file."""
-    scenes = []
-    with open(csv_file, 'r') as f:
-        reader = csv.DictReader(f)
+    """Load (video_id, fold) scenes from CSV file, optionally only those in target_split."""
+    scenes = _read_scenes_csv(csv_file)
+    if pd is None:
+        return [scene for scene in scenes if target_split is None or scene[1] == target_split]
+    
+    if target_split is not None:
+        scenes = scenes[scenes['fold'] == target_split]
+    return list(zip(scenes['video_id'].tolist(), scenes['fold'].tolist()))
+
+
+def _iter_scenes_csv(csv_file, target_split=None):
+    """
+    Yield (video_id, fold) scenes (verbatim strings) while reading the CSV row by row,
+    so a caller taking a slice stops reading the file once it has enough.
+    """
+    with open(csv_file, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        video_id_col, fold_col = header.index('video_id'), header.index('fold')
         for row in reader:
-            if target_split is None or row['fold'] == target_split:
-                scenes.append((row['video_id'], row['fold']))
-    return scenes
+            if not row:
+                continue  # Blank line
+            fold = row[fold_col]
+            if target_split is None or fold == target_split:
+                yield row[video_id_col], fold
+
+
+def load_scenes_csv_all(csv_file, splits):
+    """Load (video_id, fold) scenes of several splits in one pass, grouped in splits order."""
+    groups = {split: [] for split in splits}
+    for scene in _iter_scenes_csv(csv_file):
+        group = groups.get(scene[1])
+        if group is not None:
+            group.append(scene)
+    return [scene for split in splits for scene in groups[split]]
 
 
 # Global flag for graceful shutdown
 shutdown_requested = False
+# Relays the flag to pool workers (see _worker_init); created in main()
+shutdown_event = None
 
 def signal_handler(signum, frame):
     """Handle Ctrl+C gracefully."""
@@ -802,16 +1353,131 @@ def signal_handler(signum, frame):
     print("⏳ Waiting for current processes to finish...")
     print("💡 Press Ctrl+C again to force quit (may leave processes running)")
     shutdown_requested = True
-    
+    # Running scenes stop at their next checkpoint. The parent never waits on the
+    # event itself, so setting it here can't deadlock on its lock.
+    if shutdown_event is not None:
+        shutdown_event.set()
+
+
+def _shutdown_requested():
+    """Check for a shutdown request, in this process or relayed by the parent."""
+    event = _WORKER_STATE.get('shutdown')
+    return shutdown_requested or (event is not None and event.is_set())
+
+
 def force_signal_handler(signum, frame):
     """Force quit on second Ctrl+C."""
     print(f"\n💥 Force quit requested. Exiting immediately.")
     sys.exit(1)
 
 
+class WorkerPool:
+    """
+    One ProcessPoolExecutor shared by every phase of a run. It is started on first
+    use (runs that stay inline never fork) and replaced if a crashed worker breaks it.
+    """
+    
+    def __init__(self, max_workers, initargs):
+        self.max_workers = max_workers
+        self.initargs = initargs
+        self._executor = None
+    
+    def _start(self):
+        return ProcessPoolExecutor(max_workers=self.max_workers,
+                                   initializer=_worker_init, initargs=self.initargs)
+    
+    def submit(self, fn, *args):
+        if self._executor is None:
+            self._executor = self._start()
+        try:
+            return self._executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._executor.shutdown(wait=False)
+            self._executor = self._start()
+            return self._executor.submit(fn, *args)
+    
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+# Batches up to this size run in the main process; pool start-up isn't worth it
+INLINE_BATCH_MAX = 2
+
+
+def _should_run_inline(batch_size, num_processes, quiet, downloads):
+    """
+    Decide whether a batch runs in the main process rather than a pool. The
+    main process can't silence the downloader without muting its own progress
+    and logging, so quiet batches that download always go to the pool (with a
+    single worker when num_processes is 1).
+    """
+    if quiet and downloads:
+        return False
+    return num_processes == 1 or batch_size <= INLINE_BATCH_MAX
+
+
+def _run_batch(scene_args, redownload_attempt, progress, pool, num_processes, logger, action):
+    """
+    Run (video_id, split) scenes at a redownload attempt on the run's WorkerPool
+    (or inline), recording results in progress. action names the phase in error
+    logs (e.g. 'retrying').
+    """
+    quiet, highres_map, scene_settings, _ = pool.initargs
+    downloads = redownload_attempt > 0 or not scene_settings['skip_download']
+    
+    if _should_run_inline(len(scene_args), num_processes, quiet, downloads):
+        # Downloader output is not silenced in the main process
+        _worker_init(quiet=False, highres_map=highres_map, scene_settings=scene_settings)
+        for video_id, split in scene_args:
+            if shutdown_requested:
+                break
+            result = _run_scene(video_id, split, redownload_attempt)
+            progress.update(result, split)
+        return
+    
+    future_to_scene = {
+        pool.submit(_run_scene, video_id, split, redownload_attempt): (video_id, split)
+        for video_id, split in scene_args
+    }
+    
+    for future in as_completed(future_to_scene):
+        if shutdown_requested:
+            # The pool outlives this phase, so drop the work that hasn't started
+            for pending in future_to_scene:
+                pending.cancel()
+            break
+        video_id, split = future_to_scene[future]
+        try:
+            result = future.result()  # Already done: as_completed yielded it
+            progress.update(result, split)
+        except Exception as e:
+            logger.error(f"Exception {action} {video_id}: {e}")
+            failure_result = {
+                'video_id': video_id,
+                'success': False,
+                'error': str(e),
+                'phase': Phase.EXCEPTION
+            }
+            progress.update(failure_result, split)
+
+
+def _run_phase(scene_args, redownload_attempt, pool, num_processes, args, logger, is_background, action):
+    """Run a follow-up phase through _run_batch() with its own progress display; returns its tracker."""
+    progress = ProgressTracker(len(scene_args), args.update_interval, logger, is_background)
+    progress.start_display()
+    try:
+        _run_batch(scene_args, redownload_attempt, progress, pool, num_processes, logger, action)
+    except KeyboardInterrupt:
+        logger.warning(f"Interrupted while {action}!")
+    finally:
+        progress.stop_display_thread()
+    return progress
+
+
 def main():
-    import argparse
-    global shutdown_requested
+    global shutdown_requested, shutdown_event
     
     parser = argparse.ArgumentParser(
         description="Batch process ARKitScenes with multiprocessing support"
@@ -845,6 +1511,7 @@ def main():
     logger, log_file, is_background = setup_logging(args.log_file, args.verbose)
     
     # Set up signal handlers for graceful shutdown
+    shutdown_event = mp.Event()
     signal.signal(signal.SIGINT, signal_handler)
     
     # Determine number of processes
@@ -894,119 +1561,177 @@ def main():
         logger.error(f"CSV file not found: {csv_file}")
         sys.exit(1)
     
-    if args.split:
-        # Process specific split
-        all_scenes = load_scenes_csv(csv_file, args.split)
-        split_info = args.split
+    split_info = args.split or "Training+Validation"
+    
+    if args.count and args.count > 0 and args.start >= 0:
+        # Select subset, stopping once the requested range has been read
+        start_idx = args.start
+        end_idx = args.start + args.count
+        if args.split:
+            scene_iter = _iter_scenes_csv(csv_file, args.split)
+        else:
+            scene_iter = chain(_iter_scenes_csv(csv_file, "Training"),
+                               _iter_scenes_csv(csv_file, "Validation"))
+        scenes = list(islice(scene_iter, args.start, end_idx))
+        # The range may run past the last scene
+        end_idx = args.start + len(scenes)
     else:
-        # Process both splits
-        training_scenes = load_scenes_csv(csv_file, "Training")
-        validation_scenes = load_scenes_csv(csv_file, "Validation")
-        all_scenes = training_scenes + validation_scenes
-        split_info = "Training+Validation"
+        if args.split:
+            # Process specific split
+            all_scenes = load_scenes_csv(csv_file, args.split)
+        else:
+            # Process both splits, Training first
+            all_scenes = load_scenes_csv_all(csv_file, ("Training", "Validation"))
+        
+        # Select subset; negative --start (or --count) index from the end as in a slice
+        end_idx = min(args.start + args.count, len(all_scenes)) if args.count else len(all_scenes)
+        start_idx, end_idx, _ = slice(args.start, end_idx).indices(len(all_scenes))
+        scenes = all_scenes[start_idx:end_idx]
     
-    # Select subset
-    end_idx = args.start + args.count if args.count else len(all_scenes)
-    scenes = all_scenes[args.start:end_idx]
+    if not scenes:
+        # Nothing in range; skip the progress display and worker pool start-up
+        logger.warning(f"No scenes to process (start {args.start}, {split_info})")
+        return
     
     log_and_print(logger, f"Processing {len(scenes)} scenes (subsample 1/{args.subsample})")
     if args.force_reprocess:
         log_and_print(logger, "⚠️  Force reprocess enabled - will reprocess all scenes")
     
-    logger.info(f"Scene range: {args.start} to {end_idx-1}")
+    logger.info(f"Scene range: {start_idx} to {end_idx-1}")
     logger.info(f"Split: {split_info}")
     logger.info(f"Assets: {', '.join(args.assets)}")
     
     os.makedirs(args.download_dir, exist_ok=True)
+    raw_root = _raw_root(args.download_dir)
+    
+    # Highres availability for every scene, handed to each worker at startup
+    highres_map = load_highres_map(args.download_dir)
     
     # Initialize progress tracker
     progress = ProgressTracker(len(scenes), args.update_interval, logger, is_background)
     progress.start_display()
     
-    # Prepare arguments for worker processes
-    scene_args = []
-    for video_id, split in scenes:
-        scene_args.append((
-            video_id, split, args.download_dir, args.assets, 
-            args.subsample, args.execute, args.skip_download, args.force_reprocess, quiet, 0  # redownload_attempt = 0
-        ))
+    # Settings shared by every scene, bound into each worker once; tasks are just
+    # (video_id, split) plus the redownload attempt
+    scene_settings = {
+        'download_dir': args.download_dir,
+        'assets': args.assets,
+        'subsample_n': args.subsample,
+        'execute': args.execute,
+        'skip_download': args.skip_download,
+        'force_reprocess': args.force_reprocess,
+        'quiet': quiet,
+    }
+    scene_args = scenes
+    # (video_id, split) by video id, for the retry bookkeeping (the first entry wins,
+    # as in a front-to-back search)
+    scene_arg_by_vid = {scene_arg[0]: scene_arg for scene_arg in reversed(scene_args)}
+    # Worker pool shared by all phases below; the first pass is the largest batch
+    pool = WorkerPool(min(num_processes, len(scene_args)),
+                      (quiet, highres_map, scene_settings, shutdown_event))
     
     # First pass: process all scenes
     scenes_needing_redownload = []
     
     try:
-        if num_processes == 1:
-            # Single process mode for debugging
+        if _should_run_inline(len(scene_args), num_processes, quiet, not args.skip_download):
+            # Single process mode for debugging or tiny batches (downloader output is not silenced)
             logger.info("Running in single process mode...")
-            for i, scene_arg in enumerate(scene_args):
+            _worker_init(quiet=False, highres_map=highres_map, scene_settings=scene_settings)
+            for i, (video_id, split) in enumerate(scene_args):
                 if shutdown_requested:
                     logger.warning(f"Shutdown requested. Stopping at scene {i+1}/{len(scenes)}")
                     break
                     
-                result = process_single_scene(scene_arg)
+                result = _run_scene(video_id, split)
                 
                 # Check if this scene needs redownload
-                if result.get('phase') == 'removed_missing_intrinsics':
-                    scenes_needing_redownload.append(scene_arg[:4])  # (video_id, split, download_dir, assets)
+                if result.get('phase') == Phase.REMOVED_MISSING_INTRINSICS:
+                    scenes_needing_redownload.append((video_id, split))
                 
-                progress.update(result, scene_arg[1])
+                progress.update(result, split)
         else:
             # Multiprocess mode
             logger.info(f"Running in multiprocess mode with {num_processes} workers...")
-            with ProcessPoolExecutor(max_workers=num_processes) as executor:
-                # Submit all tasks
-                future_to_scene = {
-                    executor.submit(process_single_scene, scene_arg): (scene_arg[0], scene_arg[1]) 
-                    for scene_arg in scene_args
-                }
+            with mp.Manager() as manager:
+                # Workers stream (index, result) pairs back through a shared queue, one
+                # per scene as it finishes; chunk-level problems arrive as (None, (chunk, error))
+                result_q = manager.Queue()
                 
-                # Process completed tasks
+                def report_unfinished(future, chunk):
+                    # Cancelled chunks and chunks cut short by a lost worker don't report
+                    # (all) their scenes themselves
+                    if future.cancelled():
+                        result_q.put((None, (chunk, None)))
+                    elif future.exception() is not None:
+                        result_q.put((None, (chunk, future.exception())))
+                
+                # Submit scenes in chunks to cut per-task pickling and IPC. Downloads take
+                # long and vary a lot per scene, so they're balanced one scene at a time.
+                chunksize = 1
+                if args.skip_download:
+                    chunksize = max(1, min(SCENE_CHUNK_MAX, len(scene_args) // (pool.max_workers * 4)))
+                futures = []
+                for start in range(0, len(scene_args), chunksize):
+                    chunk = [(index, video_id, split) for index, (video_id, split)
+                             in enumerate(scene_args[start:start + chunksize], start)]
+                    future = pool.submit(_process_chunk_to_queue, chunk, result_q)
+                    future.add_done_callback(lambda f, chunk=chunk: report_unfinished(f, chunk))
+                    futures.append((future, len(chunk)))
+                
+                # Every scene reports exactly once: by itself or through its chunk
+                reported = [False] * len(scene_args)
+                remaining = len(scene_args)
                 cancelled_count = 0
+                cancel_requested = False
                 
-                for future in as_completed(future_to_scene):
-                    video_id, split = future_to_scene[future]
+                while remaining:
+                    index, result = result_q.get()
+                    if index is None:
+                        chunk, error = result
+                        results = []
+                        for index, video_id, split in chunk:
+                            if reported[index]:
+                                continue
+                            if error is None:
+                                # Cancelled before it started
+                                reported[index] = True
+                                remaining -= 1
+                                continue
+                            if not shutdown_requested:
+                                logger.error(f"Exception processing {video_id}: {error}")
+                            results.append((index, {
+                                'video_id': video_id,
+                                'success': False,
+                                'error': str(error),
+                                'phase': Phase.EXCEPTION
+                            }))
+                    else:
+                        results = [(index, result)]
                     
-                    # Check for shutdown request
-                    if shutdown_requested:
-                        logger.warning("Shutdown requested. Cancelling remaining tasks...")
-                        # Cancel remaining futures
-                        for remaining_future in future_to_scene:
-                            if not remaining_future.done():
-                                cancelled = remaining_future.cancel()
-                                if cancelled:
-                                    cancelled_count += 1
+                    for index, result in results:
+                        reported[index] = True
+                        remaining -= 1
+                        video_id, split = scene_args[index]
                         
-                        # Change signal handler to force quit on second Ctrl+C
-                        signal.signal(signal.SIGINT, force_signal_handler)
-                        logger.info(f"Waiting for {len(future_to_scene) - progress.completed - cancelled_count} running processes to complete...")
-                    
-                    try:
-                        result = future.result(timeout=1 if shutdown_requested else None)
+                        # Check for shutdown request
+                        if shutdown_requested and not cancel_requested:
+                            cancel_requested = True
+                            logger.warning("Shutdown requested. Cancelling remaining tasks...")
+                            # Cancel remaining futures
+                            for remaining_future, chunk_len in futures:
+                                if not remaining_future.done() and remaining_future.cancel():
+                                    cancelled_count += chunk_len
+                            
+                            # Change signal handler to force quit on second Ctrl+C
+                            signal.signal(signal.SIGINT, force_signal_handler)
+                            logger.info(f"Waiting for {len(scene_args) - progress.completed - cancelled_count} running processes to complete...")
                         
                         # Check if this scene needs redownload
-                        if result.get('phase') == 'removed_missing_intrinsics':
-                            # Find the original scene args
-                            for scene_arg in scene_args:
-                                if scene_arg[0] == video_id:
-                                    scenes_needing_redownload.append(scene_arg[:4])
-                                    break
+                        if result.get('phase') == Phase.REMOVED_MISSING_INTRINSICS:
+                            scenes_needing_redownload.append((video_id, split))
                         
                         progress.update(result, split)
-                    except Exception as e:
-                        if not shutdown_requested:
-                            logger.error(f"Exception processing {video_id}: {e}")
-                        # Create a failure result for progress tracking
-                        failure_result = {
-                            'video_id': video_id,
-                            'success': False,
-                            'error': str(e),
-                            'phase': 'exception'
-                        }
-                        progress.update(failure_result, split)
-                    
-                    # Break if shutdown requested and we've processed/cancelled everything
-                    if shutdown_requested and progress.completed + cancelled_count >= len(future_to_scene):
-                        break
                 
                 if cancelled_count > 0:
                     logger.info(f"Cancelled {cancelled_count} pending tasks")
@@ -1014,6 +1739,7 @@ def main():
     except KeyboardInterrupt:
         logger.warning("Force interrupted!")
         progress.stop_display_thread()
+        pool.shutdown(wait=False)
         sys.exit(1)
     
     finally:
@@ -1021,131 +1747,34 @@ def main():
         progress.stop_display_thread()
     
     # Retry phase: retry failed downloads
-    failed_scenes = []
     stats = progress.get_stats()
-    for video_id in stats['failed_downloads']:
-        # Find the original scene args for this failed scene
-        for scene_arg in scene_args:
-            if scene_arg[0] == video_id:
-                failed_scenes.append(scene_arg)
-                break
-    
-    if failed_scenes and not shutdown_requested:
-        log_and_print(logger, f"🔄 Retrying {len(failed_scenes)} failed downloads...")
+    # Original scene args for each failed scene, one dict lookup apiece
+    failed_scenes = [scene_arg_by_vid[video_id] for video_id in stats['failed_downloads']
+                     if video_id in scene_arg_by_vid]
+    
+    # Retried downloads and scenes missing intrinsics are both redownloaded (attempt 1),
+    # so they run as one batch that keeps every worker busy
+    followup_scenes = failed_scenes + scenes_needing_redownload
+    if followup_scenes and not shutdown_requested:
+        if failed_scenes:
+            log_and_print(logger, f"🔄 Retrying {len(failed_scenes)} failed downloads...")
+        if scenes_needing_redownload:
+            log_and_print(logger, f"🔄 Redownloading {len(scenes_needing_redownload)} scenes missing intrinsics...")
         
-        # Update progress tracker for retry phase
-        retry_progress = ProgressTracker(len(failed_scenes), args.update_interval, logger, is_background)
-        retry_progress.start_display()
+        followup_progress = _run_phase(followup_scenes, 1, pool, num_processes, args, logger, is_background,
+                                       'retrying')
         
-        # Prepare retry arguments (force redownload)
-        retry_args = []
-        for scene_arg in failed_scenes:
-            retry_args.append((
-                scene_arg[0], scene_arg[1], scene_arg[2], scene_arg[3], 
-                scene_arg[4], scene_arg[5], False, True, scene_arg[8], 1  # skip_download=False, force_reprocess=True, redownload_attempt=1
-            ))
-        
-        try:
-            if num_processes == 1:
-                for i, scene_arg in enumerate(retry_args):
-                    if shutdown_requested:
-                        break
-                    result = process_single_scene(scene_arg)
-                    retry_progress.update(result, scene_arg[1])
-            else:
-                with ProcessPoolExecutor(max_workers=min(num_processes, len(retry_args))) as executor:
-                    future_to_scene = {
-                        executor.submit(process_single_scene, scene_arg): (scene_arg[0], scene_arg[1]) 
-                        for scene_arg in retry_args
-                    }
-                    
-                    for future in as_completed(future_to_scene):
-                        if shutdown_requested:
-                            break
-                        video_id, split = future_to_scene[future]
-                        try:
-                            result = future.result(timeout=1 if shutdown_requested else None)
-                            retry_progress.update(result, split)
-                        except Exception as e:
-                            logger.error(f"Exception retrying {video_id}: {e}")
-                            failure_result = {
-                                'video_id': video_id,
-                                'success': False,
-                                'error': str(e),
-                                'phase': 'exception'
-                            }
-                            retry_progress.update(failure_result, split)
-            
-        except KeyboardInterrupt:
-            logger.warning("Retry interrupted!")
-        finally:
-            retry_progress.stop_display_thread()
-        
-        # Check for scenes that failed again and remove them
-        retry_stats = retry_progress.get_stats()
-        permanently_failed = retry_stats['failed_downloads'] + [item.split(' ')[0] for item in retry_stats['failed_processing']]
+        # Check for retried downloads that failed again and remove them (scenes
+        # redownloaded for missing intrinsics are left in place)
+        followup_stats = followup_progress.get_stats()
+        failed_again = set(followup_stats['failed_downloads'])
+        failed_again.update(item.split(' ')[0] for item in followup_stats['failed_processing'])
+        permanently_failed = [scene_arg for scene_arg in failed_scenes if scene_arg[0] in failed_again]
         
         if permanently_failed:
             log_and_print(logger, f"🗑️  Removing {len(permanently_failed)} scenes that failed retry...")
-            for video_id in permanently_failed:
-                # Find the scene path
-                for scene_arg in failed_scenes:
-                    if scene_arg[0] == video_id:
-                        scene_path = Path(scene_arg[2]) / "raw" / scene_arg[1] / video_id
-                        remove_scene_directory(scene_path, quiet)
-                        break
-    
-    # Second pass: redownload scenes that were missing intrinsics
-    if scenes_needing_redownload and not shutdown_requested:
-        log_and_print(logger, f"🔄 Redownloading {len(scenes_needing_redownload)} scenes missing intrinsics...")
-        
-        # Update progress tracker for redownload phase
-        redownload_progress = ProgressTracker(len(scenes_needing_redownload), args.update_interval, logger, is_background)
-        redownload_progress.start_display()
-        
-        # Prepare redownload arguments
-        redownload_args = []
-        for video_id, split, download_dir, assets in scenes_needing_redownload:
-            redownload_args.append((
-                video_id, split, download_dir, assets, 
-                args.subsample, args.execute, False, args.force_reprocess, quiet, 1  # redownload_attempt = 1
-            ))
-        
-        try:
-            if num_processes == 1:
-                for i, scene_arg in enumerate(redownload_args):
-                    if shutdown_requested:
-                        break
-                    result = process_single_scene(scene_arg)
-                    redownload_progress.update(result, scene_arg[1])
-            else:
-                with ProcessPoolExecutor(max_workers=min(num_processes, len(redownload_args))) as executor:
-                    future_to_scene = {
-                        executor.submit(process_single_scene, scene_arg): scene_arg[0] 
-                        for scene_arg in redownload_args
-                    }
-                    
-                    for future in as_completed(future_to_scene):
-                        if shutdown_requested:
-                            break
-                        video_id, split = future_to_scene[future]
-                        try:
-                            result = future.result(timeout=1 if shutdown_requested else None)
-                            redownload_progress.update(result, split)
-                        except Exception as e:
-                            logger.error(f"Exception redownloading {video_id}: {e}")
-                            failure_result = {
-                                'video_id': video_id,
-                                'success': False,
-                                'error': str(e),
-                                'phase': 'exception'
-                            }
-                            redownload_progress.update(failure_result, split)
-            
-        except KeyboardInterrupt:
-            logger.warning("Redownload interrupted!")
-        finally:
-            redownload_progress.stop_display_thread()
+            for video_id, split in permanently_failed:
+                remove_scene_directory(raw_root / split / video_id, quiet)
     
     # Final report
     progress.print_final_summary(interrupted=shutdown_requested)
@@ -1168,10 +1797,11 @@ def main():
         stats = progress.get_stats()
         successful_scenes = stats['successful_scenes']
         scenes_with_empty_dirs = []
+        # Built once and reused by the post-redownload check and removal below
+        scene_paths = {(vid, spl): raw_root / spl / vid for vid, spl in successful_scenes}
         
-        for video_id, split in successful_scenes:
-            scene_path = Path(args.download_dir) / "raw" / split / video_id
-            empty_dirs = check_scene_subfolders_empty(scene_path, args.assets)
+        empty_results = scan_empty_subfolders(scene_paths.values(), args.assets)
+        for (video_id, split), empty_dirs in zip(scene_paths, empty_results):
             if empty_dirs:
                 scenes_with_empty_dirs.append((video_id, split, empty_dirs))
         
@@ -1179,69 +1809,33 @@ def main():
             log_and_print(logger, f"🔄 Found {len(scenes_with_empty_dirs)} scenes with empty subfolders. Attempting redownload...")
             
             # Redownload these scenes
-            redownload_args = []
-            for video_id, split, empty_dirs in scenes_with_empty_dirs:
-                redownload_args.append((
-                    video_id, split, args.download_dir, args.assets,
-                    args.subsample, args.execute, False, True, quiet, 2  # redownload_attempt=2
-                ))
+            redownload_args = [(video_id, split) for video_id, split, empty_dirs in scenes_with_empty_dirs]
             
             # Process redownloads
-            empty_redownload_progress = ProgressTracker(len(redownload_args), args.update_interval, logger, is_background)
-            empty_redownload_progress.start_display()
-            
-            try:
-                if num_processes == 1:
-                    for scene_arg in redownload_args:
-                        if shutdown_requested:
-                            break
-                        result = process_single_scene(scene_arg)
-                        empty_redownload_progress.update(result, scene_arg[1])
-                else:
-                    with ProcessPoolExecutor(max_workers=min(num_processes, len(redownload_args))) as executor:
-                        future_to_scene = {executor.submit(process_single_scene, scene_arg): (scene_arg[0], scene_arg[1]) for scene_arg in redownload_args}
-                        
-                        for future in as_completed(future_to_scene):
-                            if shutdown_requested:
-                                break
-                            video_id, split = future_to_scene[future]
-                            try:
-                                result = future.result(timeout=1 if shutdown_requested else None)
-                                empty_redownload_progress.update(result, split)
-                            except Exception as e:
-                                logger.error(f"Exception redownloading {video_id}: {e}")
-                                failure_result = {
-                                    'video_id': video_id,
-                                    'success': False,
-                                    'error': str(e),
-                                    'phase': 'exception'
-                                }
-                                empty_redownload_progress.update(failure_result, split)
-            
-            finally:
-                empty_redownload_progress.stop_display_thread()
+            empty_redownload_progress = _run_phase(redownload_args, 2, pool, num_processes, args, logger,
+                                                   is_background, 'redownloading')
             
             # Check which ones are still empty and remove them
             empty_redownload_stats = empty_redownload_progress.get_stats()
-            successful_redownloads = empty_redownload_stats['successful_scenes']
-            still_empty = []
+            successful_redownloads = set(empty_redownload_stats['successful_scenes'])
+            # Redownload failed
+            still_empty = [(video_id, split) for video_id, split, _ in scenes_with_empty_dirs
+                           if (video_id, split) not in successful_redownloads]
             
-            for video_id, split, original_empty_dirs in scenes_with_empty_dirs:
-                if (video_id, split) not in [(vid, spl) for vid, spl in successful_redownloads]:
-                    # Redownload failed
-                    still_empty.append((video_id, split))
-                else:
-                    # Check if still empty
-                    scene_path = Path(args.download_dir) / "raw" / split / video_id
-                    empty_dirs = check_scene_subfolders_empty(scene_path, args.assets)
-                    if empty_dirs:
-                        still_empty.append((video_id, split))
+            # Check if still empty
+            redownloaded = [(video_id, split) for video_id, split, _ in scenes_with_empty_dirs
+                            if (video_id, split) in successful_redownloads]
+            recheck = scan_empty_subfolders((scene_paths[scene] for scene in redownloaded), args.assets)
+            still_empty.extend(scene for scene, empty_dirs in zip(redownloaded, recheck) if empty_dirs)
             
-            if still_empty:
+            # Scenes stopped by a shutdown request never reported; leave them for the next run
+            if still_empty and not shutdown_requested:
                 log_and_print(logger, f"🗑️ Removing {len(still_empty)} scenes that remain empty after redownload...")
                 for video_id, split in still_empty:
-                    scene_path = Path(args.download_dir) / "raw" / split / video_id
-                    remove_scene_directory(scene_path, quiet)
+                    remove_scene_directory(scene_paths[(video_id, split)], quiet)
+    
+    # Waits for any tasks still running after a shutdown request
+    pool.shutdown()
     
     if shutdown_requested:
         log_and_print(logger, "💡 To resume processing, run the same command again.")
@@ -157,10 +157,13 @@ def download_data(dataset,
                   raw_dataset_assets,
                   should_download_laser_scanner_point_cloud,
                   ):
+    # Returns True if every requested file was downloaded (and unzipped)
     metadata = get_metadata(dataset, download_dir)
     if None is metadata:
         print(f"Error retrieving metadata for dataset {dataset}")
-        return
+        return False
+
+    success = True
 
     download_dir = os.path.abspath(download_dir)
     for video_id in sorted(set(video_ids)):
@@ -193,17 +196,29 @@ def download_data(dataset,
             url = url_prefix.format(file_name)
 
             if not file_name.endswith('.zip') or not os.path.isdir(dst_path[:-len('.zip')]):
-                download_file(url, dst_path, dst_dir)
+                if not download_file(url, dst_path, dst_dir):
+                    success = False
             else:
                 print(f'WARNING: skipping download of existing zip file: {dst_path}')
             if file_name.endswith('.zip') and os.path.isfile(dst_path):
-                unzip_file(file_name, dst_dir, keep_zip)
+                if not unzip_file(file_name, dst_dir, keep_zip):
+                    success = False
 
     if dataset == 'upsampling' and VALIDATION in dataset_splits:
         val_attributes_file = "val_attributes.csv"
         url = f"{ARkitscense_url}/upsampling/{VALIDATION}/{val_attributes_file}"
         dst_file = os.path.join(download_dir, dataset, VALIDATION)
-        download_file(url, val_attributes_file, dst_file)
+        if not download_file(url, val_attributes_file, dst_file):
+            success = False
+
+    return success
+
+
+def download(split, video_id, download_dir, assets, keep_zip=False):
+    # In-process entry point for a single raw video, equivalent to
+    # `download_data.py raw --split <split> --video_id <video_id> --raw_dataset_assets <assets>`.
+    # Returns False if a download or unzip failed.
+    return download_data('raw', [video_id], [split], download_dir, keep_zip, assets, False)
 
 
 if __name__ == "__main__":
@@ -6,7 +6,12 @@ Removes any files that don't have corresponding matches across all three modalit
 
 import os
 import sys
+import json
+from functools import partial
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from scene_utils import scan_timestamped_files, remove_files, scene_dir_stats
 
 
 def extract_timestamp_from_filename(filename):
@@ -24,10 +29,13 @@ def extract_timestamp_from_filename(filename):
     return None
 
 
-def find_matching_files(scene_path):
+def find_matching_files(scene_path, log=print):
     """
     Find matching files across RGB, depth, and intrinsics directories.
-    Returns sets of timestamps for each modality.
+    Returns sets of (float) timestamps for each modality, for each modality a map
+    from timestamp to (timestamp string, file path), and for each modality the
+    (timestamp string, file path) pairs whose timestamp repeats another file's
+    in the same directory (100.1 and 100.10). Messages go to log.
     """
     scene_path = Path(scene_path)
     
@@ -39,126 +47,154 @@ def find_matching_files(scene_path):
     # Check if directories exist
     for dir_path, name in [(rgb_dir, "RGB"), (depth_dir, "depth"), (intrinsics_dir, "intrinsics")]:
         if not dir_path.exists():
-            print(f"ERROR: {name} directory not found: {dir_path}")
-            return None, None, None, None
-    
-    # Get timestamps from each directory
-    rgb_timestamps = set()
-    depth_timestamps = set()
-    intrinsics_timestamps = set()
-    
-    # RGB files
-    rgb_files = {}
-    for file in rgb_dir.iterdir():
-        if file.is_file() and file.suffix.lower() == '.png':
-            timestamp = extract_timestamp_from_filename(file.name)
-            if timestamp:
-                rgb_timestamps.add(timestamp)
-                rgb_files[timestamp] = file
-    
-    # Depth files  
-    depth_files = {}
-    for file in depth_dir.iterdir():
-        if file.is_file() and file.suffix.lower() == '.png':
-            timestamp = extract_timestamp_from_filename(file.name)
-            if timestamp:
-                depth_timestamps.add(timestamp)
-                depth_files[timestamp] = file
-    
-    # Intrinsics files
-    intrinsics_files = {}
-    for file in intrinsics_dir.iterdir():
-        if file.is_file() and file.suffix.lower() == '.pincam':
-            timestamp = extract_timestamp_from_filename(file.name)
-            if timestamp:
-                intrinsics_timestamps.add(timestamp)
-                intrinsics_files[timestamp] = file
-    
-    return rgb_timestamps, depth_timestamps, intrinsics_timestamps, (rgb_files, depth_files, intrinsics_files)
-
-
-def clean_scene(scene_path, dry_run=True):
+            log(f"ERROR: {name} directory not found: {dir_path}")
+            return None, None, None, None, None
+    
+    # Get timestamps and files from each directory
+    rgb_duplicates, depth_duplicates, intrinsics_duplicates = [], [], []
+    rgb_files = scan_timestamped_files(rgb_dir, '.png', rgb_duplicates)
+    depth_files = scan_timestamped_files(depth_dir, '.png', depth_duplicates)
+    intrinsics_files = scan_timestamped_files(intrinsics_dir, '.pincam', intrinsics_duplicates)
+    
+    rgb_timestamps = set(rgb_files)
+    depth_timestamps = set(depth_files)
+    intrinsics_timestamps = set(intrinsics_files)
+    
+    return (rgb_timestamps, depth_timestamps, intrinsics_timestamps, (rgb_files, depth_files, intrinsics_files),
+            (rgb_duplicates, depth_duplicates, intrinsics_duplicates))
+
+
+# Written into a scene once it is fully matched, so unchanged scenes are not rescanned
+CLEAN_CACHE_NAME = ".arkit_clean_cache"
+CLEAN_CACHE_VERSION = 3
+CLEAN_SCENE_DIRS = ("lowres_wide", "lowres_depth", "lowres_wide_intrinsics")
+
+
+def _read_clean_cache(scene_path, dir_stats):
+    """Matched count recorded by an earlier clean, if the directories have not changed since."""
+    try:
+        with open(os.path.join(scene_path, CLEAN_CACHE_NAME), 'r') as f:
+            cached = json.load(f)
+        if cached.get('version') == CLEAN_CACHE_VERSION and cached.get('dir_stats') == dir_stats:
+            return cached['matched']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _write_clean_cache(scene_path, matched):
+    """
+    Record that a scene cleaned with --execute is fully matched; a failed write
+    only costs a rescan next time.
+    """
+    dir_stats = scene_dir_stats(scene_path, CLEAN_SCENE_DIRS)
+    if dir_stats is None:
+        return
+    cache_file = os.path.join(scene_path, CLEAN_CACHE_NAME)
+    try:
+        with open(cache_file + '.tmp', 'w') as f:
+            json.dump({'version': CLEAN_CACHE_VERSION, 'dir_stats': dir_stats, 'matched': matched}, f)
+        os.replace(cache_file + '.tmp', cache_file)
+    except OSError:
+        pass
+
+
+def clean_scene(scene_path, dry_run=True, log=print, verbose=False):
     """
     Clean a scene by removing unmatched files.
     
     Args:
         scene_path: Path to the scene directory
         dry_run: If True, only report what would be deleted without actually deleting
+        log: Called with each output line
+        verbose: If True, also list each file as it is removed
+    
+    Returns:
+        True if the scene was cleaned (or already clean), False if it could not be
     """
-    print(f"\n{'='*60}")
-    print(f"Processing scene: {scene_path}")
-    print(f"{'='*60}")
+    log(f"\n{'='*60}")
+    log(f"Processing scene: {scene_path}")
+    log(f"{'='*60}")
+    
+    # Skip the scan when the directories are unchanged since the scene was last found clean
+    dir_stats = scene_dir_stats(scene_path, CLEAN_SCENE_DIRS)
+    if dir_stats is not None:
+        matched = _read_clean_cache(scene_path, dir_stats)
+        if matched is not None:
+            log(f"✅ Already clean (cached): {matched} matched sets")
+            return True
     
     # Find matching files
-    rgb_timestamps, depth_timestamps, intrinsics_timestamps, file_maps = find_matching_files(scene_path)
+    rgb_timestamps, depth_timestamps, intrinsics_timestamps, file_maps, duplicates = find_matching_files(scene_path, log)
     
     if rgb_timestamps is None or depth_timestamps is None or intrinsics_timestamps is None or file_maps is None:
         return False
     
     rgb_files, depth_files, intrinsics_files = file_maps
+    rgb_duplicates, depth_duplicates, intrinsics_duplicates = duplicates
     
     # Find common timestamps (intersection of all three sets)
     common_timestamps = rgb_timestamps & depth_timestamps & intrinsics_timestamps
     
-    # Find files to remove
-    rgb_to_remove = rgb_timestamps - common_timestamps
-    depth_to_remove = depth_timestamps - common_timestamps  
-    intrinsics_to_remove = intrinsics_timestamps - common_timestamps
+    # Find files to remove; a file repeating another's timestamp is unmatched too
+    rgb_to_remove = ([rgb_files[ts][1] for ts in rgb_timestamps - common_timestamps]
+                     + [path for _, path in rgb_duplicates])
+    depth_to_remove = ([depth_files[ts][1] for ts in depth_timestamps - common_timestamps]
+                       + [path for _, path in depth_duplicates])
+    intrinsics_to_remove = ([intrinsics_files[ts][1] for ts in intrinsics_timestamps - common_timestamps]
+                            + [path for _, path in intrinsics_duplicates])
     
     # Report statistics
-    print(f"RGB files: {len(rgb_timestamps)}")
-    print(f"Depth files: {len(depth_timestamps)}")
-    print(f"Intrinsics files: {len(intrinsics_timestamps)}")
-    print(f"Common timestamps: {len(common_timestamps)}")
-    print(f"Files to remove - RGB: {len(rgb_to_remove)}, Depth: {len(depth_to_remove)}, Intrinsics: {len(intrinsics_to_remove)}")
+    log(f"RGB files: {len(rgb_timestamps) + len(rgb_duplicates)}")
+    log(f"Depth files: {len(depth_timestamps) + len(depth_duplicates)}")
+    log(f"Intrinsics files: {len(intrinsics_timestamps) + len(intrinsics_duplicates)}")
+    log(f"Common timestamps: {len(common_timestamps)}")
+    log(f"Files to remove - RGB: {len(rgb_to_remove)}, Depth: {len(depth_to_remove)}, Intrinsics: {len(intrinsics_to_remove)}")
     
     if len(rgb_to_remove) == 0 and len(depth_to_remove) == 0 and len(intrinsics_to_remove) == 0:
-        print("✅ All files already match! No cleanup needed.")
+        log("✅ All files already match! No cleanup needed.")
+        if not dry_run:
+            _write_clean_cache(scene_path, len(common_timestamps))
         return True
     
-    # Remove unmatched files
-    total_removed = 0
-    
-    # Remove RGB files without matches
-    for timestamp in rgb_to_remove:
-        file_path = rgb_files[timestamp]
-        if dry_run:
-            print(f"[DRY RUN] Would remove RGB: {file_path}")
-        else:
-            print(f"Removing RGB: {file_path}")
-            file_path.unlink()
-        total_removed += 1
-    
-    # Remove depth files without matches
-    for timestamp in depth_to_remove:
-        file_path = depth_files[timestamp]
-        if dry_run:
-            print(f"[DRY RUN] Would remove Depth: {file_path}")
-        else:
-            print(f"Removing Depth: {file_path}")
-            file_path.unlink()
-        total_removed += 1
-    
-    # Remove intrinsics files without matches
-    for timestamp in intrinsics_to_remove:
-        file_path = intrinsics_files[timestamp]
-        if dry_run:
-            print(f"[DRY RUN] Would remove Intrinsics: {file_path}")
-        else:
-            print(f"Removing Intrinsics: {file_path}")
-            file_path.unlink()
-        total_removed += 1
+    # Remove unmatched files; execute mode lists each file only when verbose
+    remove_paths = []
+    for paths, label in ((rgb_to_remove, "RGB"), (depth_to_remove, "Depth"), (intrinsics_to_remove, "Intrinsics")):
+        for file_path in paths:
+            if dry_run:
+                log(f"[DRY RUN] Would remove {label}: {file_path}")
+            else:
+                if verbose:
+                    log(f"Removing {label}: {file_path}")
+                remove_paths.append(file_path)
+    total_removed = len(rgb_to_remove) + len(depth_to_remove) + len(intrinsics_to_remove)
+    
+    # All three modalities are deleted as one batch
+    remove_files(remove_paths)
+    if not dry_run:
+        _write_clean_cache(scene_path, len(common_timestamps))
     
     action = "Would remove" if dry_run else "Removed"
-    print(f"\n{action} {total_removed} unmatched files")
-    print(f"Remaining matched sets: {len(common_timestamps)}")
+    log(f"\n{action} {total_removed} unmatched files")
+    log(f"Remaining matched sets: {len(common_timestamps)}")
     
     return True
 
 
+def _clean_scene_buffered(scene_path, dry_run, verbose):
+    """clean_scene() for a pool worker: returns (success, output lines), to print in order."""
+    output = []
+    success = clean_scene(scene_path, dry_run, log=output.append, verbose=verbose)
+    return success, output
+
+
+# Scene directories cleaned concurrently when processing a directory of scenes
+MAX_WORKERS = 8
+
+
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python clean_matching_files.py <scene_path> [--execute]")
+        print("Usage: python clean_matching_files.py <scene_path> [--execute] [--verbose]")
         print("")
         print("Examples:")
         print("  # Dry run (default)")
@@ -167,12 +203,16 @@ def main():
         print("  # Actually delete unmatched files")
         print("  python clean_matching_files.py ~/arkitscenes_data/raw/Training/47333462/ --execute")
         print("")
+        print("  # Also list each file as it is deleted")
+        print("  python clean_matching_files.py ~/arkitscenes_data/raw/Training/47333462/ --execute --verbose")
+        print("")
         print("  # Process all scenes in a directory")
         print("  python clean_matching_files.py ~/arkitscenes_data/raw/Training/ --execute")
         sys.exit(1)
     
     scene_path = Path(sys.argv[1]).expanduser().resolve()
     dry_run = "--execute" not in sys.argv
+    verbose = "--verbose" in sys.argv
     
     if dry_run:
         print("🔍 DRY RUN MODE - No files will be deleted")
@@ -183,7 +223,7 @@ def main():
     # Check if it's a single scene or directory of scenes
     if (scene_path / "lowres_wide").exists():
         # Single scene
-        clean_scene(scene_path, dry_run)
+        clean_scene(scene_path, dry_run, verbose=verbose)
     else:
         # Directory of scenes
         print(f"Processing all scenes in: {scene_path}")
@@ -193,10 +233,16 @@ def main():
             print(f"No scene directories found in {scene_path}")
             sys.exit(1)
         
+        # Scenes share nothing, so they are cleaned in parallel; each scene's
+        # output is printed in one piece, in scene order
         success_count = 0
-        for scene_dir in sorted(scene_dirs):
-            if clean_scene(scene_dir, dry_run):
-                success_count += 1
+        with ProcessPoolExecutor(max_workers=min(MAX_WORKERS, len(scene_dirs))) as executor:
+            for success, output in executor.map(partial(_clean_scene_buffered, dry_run=dry_run, verbose=verbose),
+                                                sorted(scene_dirs)):
+                for line in output:
+                    print(line)
+                if success:
+                    success_count += 1
         
         print(f"\n{'='*60}")
         print(f"Processed {success_count}/{len(scene_dirs)} scenes successfully")
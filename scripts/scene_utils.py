@@ -4,8 +4,20 @@ Utility functions for loading and verifying ARKitScenes data.
 """
 
 import os
+import json
+import math
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
+
+
+# Scene directories the matched frame files come from
+SCENE_DIRS = ("ultrawide", "highres_depth", "ultrawide_intrinsics")
+# Per-scene results of verify_and_get_frame_paths(), reused while the directories are unchanged
+TRIPLET_CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME', '~/.cache')).expanduser() / "arkitscenes"
+TRIPLET_CACHE_VERSION = 5
 
 
 def extract_timestamp_from_filename(filename: str) -> Optional[str]:
@@ -23,17 +35,112 @@ def extract_timestamp_from_filename(filename: str) -> Optional[str]:
     return None
 
 
-def verify_scene_integrity(scene_path: str) -> Tuple[bool, dict]:
+def scan_timestamped_files(dir_path, suffix: str, duplicates: Optional[list] = None) -> dict:
     """
-    Verify that a scene has matching RGB, depth, and intrinsics files.
+    Map timestamp -> (timestamp string, file path) for the regular files in dir_path
+    ending in suffix. Timestamps are parsed to float once here, so matching across
+    directories hashes and compares numbers; names without a numeric timestamp are skipped.
+    os.scandir reports the file type from the directory listing, so no per-file stat.
+    Names that parse to the same number (100.1, 100.10) keep the smallest timestamp
+    string; the other (timestamp string, file path) pairs are appended to duplicates.
+    """
+    files = {}
+    suffix_upper = suffix.upper()
+    suffix_len = len(suffix)
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            # Same rules as extract_timestamp_from_filename(), as plain str slicing
+            name = entry.name
+            if name[0] == '.' or not (name.endswith(suffix) or name.endswith(suffix_upper)):
+                continue
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            timestamp = name[name.rfind('_') + 1:-suffix_len] if '_' in name else None
+            if timestamp:
+                try:
+                    key = float(timestamp)
+                except ValueError:
+                    continue
+                if not math.isfinite(key):
+                    continue
+                found = (timestamp, entry.path)
+                if key in files:
+                    # Keep one file per number whatever the listing order
+                    if timestamp < files[key][0]:
+                        files[key], found = found, files[key]
+                    if duplicates is not None:
+                        duplicates.append(found)
+                    continue
+                files[key] = found
+    return files
+
+
+# Batches smaller than this are unlinked inline; thread start-up would dominate
+PARALLEL_UNLINK_MIN_FILES = 64
+UNLINK_WORKERS = 16
+
+
+def remove_files(paths, max_workers: int = UNLINK_WORKERS) -> None:
+    """Unlink a batch of files, overlapping the syscalls on a thread pool for large batches."""
+    paths = [os.fspath(p) for p in paths]
+    if len(paths) < PARALLEL_UNLINK_MIN_FILES:
+        for path in paths:
+            os.unlink(path)
+        return
+    
+    # os.unlink releases the GIL, so threads overlap the filesystem round-trips.
+    # list() re-raises the first failure, like the sequential loop did.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(os.unlink, paths))
+
+
+def _merge_timestamps(rgb_keys, depth_keys, intrinsics_keys):
+    """
+    Walk three sorted timestamp lists together, advancing past the smallest head.
+    Returns (matched, unmatched): timestamps present in all three lists and those
+    missing from at least one, both in sorted order.
+    """
+    end = math.inf  # Past any (finite) timestamp
+    i = j = k = 0
+    n_rgb, n_depth, n_intrinsics = len(rgb_keys), len(depth_keys), len(intrinsics_keys)
+    matched = []
+    unmatched = []
+    while True:
+        rgb_ts = rgb_keys[i] if i < n_rgb else end
+        depth_ts = depth_keys[j] if j < n_depth else end
+        intrinsics_ts = intrinsics_keys[k] if k < n_intrinsics else end
+        ts = min(rgb_ts, depth_ts, intrinsics_ts)
+        if ts == end:
+            return matched, unmatched
+        if rgb_ts == depth_ts == intrinsics_ts:
+            matched.append(ts)
+            i += 1
+            j += 1
+            k += 1
+        else:
+            unmatched.append(ts)
+            if rgb_ts == ts:
+                i += 1
+            if depth_ts == ts:
+                j += 1
+            if intrinsics_ts == ts:
+                k += 1
+
+
+def verify_and_get_frame_paths(scene_path: str) -> Tuple[bool, dict, Dict[str, List[str]]]:
+    """
+    Verify a scene and list its matching files in one pass over its directories.
     
     Args:
         scene_path: Path to the scene directory
         
     Returns:
-        Tuple of (is_valid, info_dict)
+        Tuple of (is_valid, info_dict, frame_paths)
         - is_valid: True if all files match
         - info_dict: Dictionary with file counts and mismatch details
+        - frame_paths: {'timestamps': [...], 'rgb': [...], 'depth': [...], 'intrinsics': [...]},
+          parallel lists of the matched timestamps and files in timestamp order (empty
+          if a directory is missing)
     """
     scene_path_obj = Path(scene_path)
     
@@ -57,49 +164,125 @@ def verify_scene_integrity(scene_path: str) -> Tuple[bool, dict]:
             info['missing_dirs'].append(name)
     
     if info['missing_dirs']:
-        return False, info
-    
-    # Get timestamps from each directory
-    rgb_timestamps = set()
-    depth_timestamps = set()
-    intrinsics_timestamps = set()
+        return False, info, {'timestamps': [], 'rgb': [], 'depth': [], 'intrinsics': []}
     
-    # RGB files
-    for file in rgb_dir.iterdir():
-        if file.is_file() and file.suffix.lower() == '.png':
-            timestamp = extract_timestamp_from_filename(file.name)
-            if timestamp:
-                rgb_timestamps.add(timestamp)
-    
-    # Depth files  
-    for file in depth_dir.iterdir():
-        if file.is_file() and file.suffix.lower() == '.png':
-            timestamp = extract_timestamp_from_filename(file.name)
-            if timestamp:
-                depth_timestamps.add(timestamp)
-    
-    # Intrinsics files
-    for file in intrinsics_dir.iterdir():
-        if file.is_file() and file.suffix.lower() == '.pincam':
-            timestamp = extract_timestamp_from_filename(file.name)
-            if timestamp:
-                intrinsics_timestamps.add(timestamp)
+    # Get timestamps and files from each directory; files whose timestamp repeats
+    # another's in the same directory cannot be matched and count as unmatched
+    rgb_duplicates, depth_duplicates, intrinsics_duplicates = [], [], []
+    rgb_files = scan_timestamped_files(rgb_dir, '.png', rgb_duplicates)
+    depth_files = scan_timestamped_files(depth_dir, '.png', depth_duplicates)
+    intrinsics_files = scan_timestamped_files(intrinsics_dir, '.pincam', intrinsics_duplicates)
     
     # Update counts
-    info['rgb_count'] = len(rgb_timestamps)
-    info['depth_count'] = len(depth_timestamps)
-    info['intrinsics_count'] = len(intrinsics_timestamps)
-    
-    # Find common timestamps
-    common_timestamps = rgb_timestamps & depth_timestamps & intrinsics_timestamps
-    info['matched_count'] = len(common_timestamps)
+    info['rgb_count'] = len(rgb_files) + len(rgb_duplicates)
+    info['depth_count'] = len(depth_files) + len(depth_duplicates)
+    info['intrinsics_count'] = len(intrinsics_files) + len(intrinsics_duplicates)
+    
+    # Find common and unmatched timestamps in one sorted merge
+    keys, unmatched = _merge_timestamps(sorted(rgb_files), sorted(depth_files), sorted(intrinsics_files))
+    info['matched_count'] = len(keys)
+    
+    # Unmatched timestamps are reported as they appear in the file names
+    info['unmatched_timestamps'] = [
+        (rgb_files.get(key) or depth_files.get(key) or intrinsics_files[key])[0]
+        for key in unmatched
+    ] + [timestamp for timestamp, _ in rgb_duplicates + depth_duplicates + intrinsics_duplicates]
+    
+    # One list per modality, index-aligned by frame in time order
+    frame_paths = {
+        'timestamps': [rgb_files[key][0] for key in keys],
+        'rgb': [rgb_files[key][1] for key in keys],
+        'depth': [depth_files[key][1] for key in keys],
+        'intrinsics': [intrinsics_files[key][1] for key in keys]
+    }
     
-    # Find unmatched timestamps
-    all_timestamps = rgb_timestamps | depth_timestamps | intrinsics_timestamps
-    unmatched = all_timestamps - common_timestamps
-    info['unmatched_timestamps'] = sorted(list(unmatched))
+    is_valid = len(info['unmatched_timestamps']) == 0
+    return is_valid, info, frame_paths
+
+
+def verify_and_get_triplets(scene_path: str) -> Tuple[bool, dict, List[Tuple[str, str, str]]]:
+    """
+    verify_and_get_frame_paths(), with the files as a sorted list of
+    (rgb_file, depth_file, intrinsics_file) triplets.
+    """
+    is_valid, info, frame_paths = verify_and_get_frame_paths(scene_path)
+    return is_valid, info, list(zip(frame_paths['rgb'], frame_paths['depth'], frame_paths['intrinsics']))
+
+
+def scene_dir_stats(scene_path: str, dir_names: Tuple[str, ...] = SCENE_DIRS) -> Optional[dict]:
+    """
+    Stat the scene's dir_names directories for cache validation; None if one is missing.
+    Adding, removing or renaming a file updates its directory's mtime (and often size).
+    """
+    dir_stats = {}
+    for name in dir_names:
+        try:
+            st = os.stat(os.path.join(scene_path, name))
+        except OSError:
+            return None
+        dir_stats[name] = [st.st_ino, st.st_mtime_ns, st.st_size]
+    return dir_stats
+
+
+def verify_and_get_frame_paths_cached(scene_path: str) -> Tuple[bool, dict, Dict[str, List[str]]]:
+    """
+    verify_and_get_frame_paths(), with the result cached in TRIPLET_CACHE_DIR.
+    The cache entry is keyed on the scene path and reused while none of the
+    scene directories has changed, so reloading a scene skips the listing.
+    """
+    scene_path = os.path.abspath(scene_path)
+    dir_stats = scene_dir_stats(scene_path)
+    if dir_stats is None:
+        # Missing directories are reported by the uncached check
+        return verify_and_get_frame_paths(scene_path)
+    
+    cache_file = TRIPLET_CACHE_DIR / f"{hashlib.sha1(scene_path.encode()).hexdigest()}.json"
+    try:
+        with open(cache_file, 'r') as f:
+            cached = json.load(f)
+        if (cached.get('version') == TRIPLET_CACHE_VERSION and cached.get('scene_path') == scene_path
+                and cached.get('dir_stats') == dir_stats):
+            return cached['is_valid'], cached['info'], cached['frame_paths']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass  # Missing or unreadable cache; rebuild it
+    
+    is_valid, info, frame_paths = verify_and_get_frame_paths(scene_path)
+    
+    # Write to a temporary file and rename it into place, so readers never see a partial entry
+    try:
+        TRIPLET_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=TRIPLET_CACHE_DIR, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    'version': TRIPLET_CACHE_VERSION,
+                    'scene_path': scene_path,
+                    'dir_stats': dir_stats,
+                    'is_valid': is_valid,
+                    'info': info,
+                    'frame_paths': frame_paths
+                }, f)
+            os.replace(tmp_path, cache_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        pass  # The cache is only an optimisation
+    
+    return is_valid, info, frame_paths
+
+
+def verify_scene_integrity(scene_path: str) -> Tuple[bool, dict]:
+    """
+    Verify that a scene has matching RGB, depth, and intrinsics files.
     
-    is_valid = len(unmatched) == 0
+    Args:
+        scene_path: Path to the scene directory
+        
+    Returns:
+        Tuple of (is_valid, info_dict), as from verify_and_get_frame_paths()
+    """
+    is_valid, info, _ = verify_and_get_frame_paths(scene_path)
     return is_valid, info
 
 
@@ -113,52 +296,7 @@ def get_matched_file_triplets(scene_path: str) -> List[Tuple[str, str, str]]:
     Returns:
         List of tuples (rgb_file, depth_file, intrinsics_file)
     """
-    scene_path_obj = Path(scene_path)
-    
-    # Define directories
-    rgb_dir = scene_path_obj / "ultrawide"
-    depth_dir = scene_path_obj / "highres_depth" 
-    intrinsics_dir = scene_path_obj / "ultrawide_intrinsics"
-    
-    # Get timestamps and files
-    rgb_files = {}
-    depth_files = {}
-    intrinsics_files = {}
-    
-    # RGB files
-    for file in rgb_dir.iterdir():
-        if file.is_file() and file.suffix.lower() == '.png':
-            timestamp = extract_timestamp_from_filename(file.name)
-            if timestamp:
-                rgb_files[timestamp] = str(file)
-    
-    # Depth files  
-    for file in depth_dir.iterdir():
-        if file.is_file() and file.suffix.lower() == '.png':
-            timestamp = extract_timestamp_from_filename(file.name)
-            if timestamp:
-                depth_files[timestamp] = str(file)
-    
-    # Intrinsics files
-    for file in intrinsics_dir.iterdir():
-        if file.is_file() and file.suffix.lower() == '.pincam':
-            timestamp = extract_timestamp_from_filename(file.name)
-            if timestamp:
-                intrinsics_files[timestamp] = str(file)
-    
-    # Find common timestamps
-    common_timestamps = set(rgb_files.keys()) & set(depth_files.keys()) & set(intrinsics_files.keys())
-    
-    # Create triplets
-    triplets = []
-    for timestamp in sorted(common_timestamps):
-        triplets.append((
-            rgb_files[timestamp],
-            depth_files[timestamp], 
-            intrinsics_files[timestamp]
-        ))
-    
-    return triplets
+    return verify_and_get_triplets(scene_path)[2]
 
 
 def load_camera_intrinsics(intrinsics_file: str) -> dict:
@@ -171,21 +309,23 @@ def load_camera_intrinsics(intrinsics_file: str) -> dict:
     Returns:
         Dictionary with intrinsics parameters
     """
-    with open(intrinsics_file, 'r') as f:
-        line = f.readline().strip()
-        values = line.split()
-        
-        if len(values) != 6:
-            raise ValueError(f"Invalid intrinsics file format: {intrinsics_file}")
-        
-        return {
-            'width': int(values[0]),
-            'height': int(values[1]),
-            'fx': float(values[2]),
-            'fy': float(values[3]),
-            'cx': float(values[4]),
-            'cy': float(values[5])
-        }
+    # Binary mode skips the text decoding layer; int() and float() parse bytes directly
+    with open(intrinsics_file, 'rb') as f:
+        line = f.readline()
+    
+    try:
+        width, height, fx, fy, cx, cy = line.split()
+    except ValueError:
+        raise ValueError(f"Invalid intrinsics file format: {intrinsics_file}") from None
+    
+    return {
+        'width': int(width),
+        'height': int(height),
+        'fx': float(fx),
+        'fy': float(fy),
+        'cx': float(cx),
+        'cy': float(cy)
+    }
 
 
 if __name__ == "__main__":
@@ -198,7 +338,7 @@ if __name__ == "__main__":
     scene_path = sys.argv[1]
     
     # Verify scene integrity
-    is_valid, info = verify_scene_integrity(scene_path)
+    is_valid, info, triplets = verify_and_get_triplets(scene_path)
     
     print(f"Scene: {scene_path}")
     print(f"Valid: {is_valid}")
@@ -219,7 +359,6 @@ if __name__ == "__main__":
     
     # Show sample triplets
     if is_valid:
-        triplets = get_matched_file_triplets(scene_path)
         print(f"\nSample file triplets:")
         for i, (rgb, depth, intrinsics) in enumerate(triplets[:3]):
             print(f"  {i+1}. RGB: {Path(rgb).name}")
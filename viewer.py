@@ -8,28 +8,46 @@ Usage:
     python viewer.py ./data
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, send_file
 import cv2
 import numpy as np
 from pathlib import Path
 import io
-import base64
 import json
 import os
 import sys
+import time
+import struct
 import argparse
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from scripts.scene_utils import verify_scene_integrity, get_matched_file_triplets, load_camera_intrinsics
+from scripts.scene_utils import verify_and_get_frame_paths_cached, load_camera_intrinsics
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None  # Depth is colorized with NumPy and OpenCV instead
 
 app = Flask(__name__)
 
 # Global variables
 data_root = None
-current_scene_path = None
-file_triplets = []
-scene_info = {}
+# The loaded scene (a LoadedScene), replaced in one assignment by load_scene(). Requests
+# read it once and use that snapshot, so they never mix frames of two scenes.
+loaded_scene = None
 available_scenes = {'Training': [], 'Validation': []}
 
+# Viridis colors for depth levels 0-255 in BGR and RGB order, built once for every frame.
+# Shaped (256, 1, 3) so cv2.applyColorMap() can use them as user colormaps.
+_VIRIDIS_LUT_BGR = cv2.applyColorMap(np.arange(256, dtype=np.uint8).reshape(256, 1), cv2.COLORMAP_VIRIDIS)
+_VIRIDIS_LUT_RGB = np.ascontiguousarray(_VIRIDIS_LUT_BGR[:, :, ::-1])
+
+# Upper bound on prewarm processes, so startup does not take every core from the server
+MAX_PREWARM_WORKERS = 8
+
 
 def validate_data_structure(data_root_path):
     """Validate that the data root contains Training and Validation folders with scenes."""
@@ -72,53 +90,247 @@ def validate_data_structure(data_root_path):
     return sorted(training_scenes), sorted(validation_scenes)
 
 
+def prewarm_scene_cache(data_root_path, scenes, max_workers=None):
+    """
+    Build the on-disk scene cache for every scene on a process pool, from a
+    background thread so the server starts right away. Returns the thread, or
+    None when there are no scenes.
+    """
+    scene_paths = [os.path.join(data_root_path, split, scene_id)
+                   for split, scene_ids in scenes.items() for scene_id in scene_ids]
+    if not scene_paths:
+        return None
+    workers = min(max_workers or MAX_PREWARM_WORKERS, os.cpu_count() or 1, len(scene_paths))
+    
+    def run():
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(verify_and_get_frame_paths_cached, path) for path in scene_paths]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception:
+                    pass  # The scene reports its problem when it is loaded
+    
+    thread = threading.Thread(target=run, name='scene-cache-prewarm', daemon=True)
+    thread.start()
+    return thread
+
+
+# A loaded scene. The frame lists are index-aligned per modality; token changes on every
+# load so frame image URLs from different scenes never collide; ts_to_idx maps each
+# timestamp to its frame index.
+LoadedScene = namedtuple('LoadedScene', ['path', 'info', 'token', 'timestamps', 'rgb_paths', 'depth_paths',
+                                         'intrinsics_paths', 'ts_to_idx'])
+
+
 def load_scene(scene_path):
-    """Load a scene and update global variables."""
-    global current_scene_path, file_triplets, scene_info
+    """Load a scene and make it the current one. Returns its LoadedScene."""
+    global loaded_scene
     
-    # Verify scene integrity
-    is_valid, info = verify_scene_integrity(scene_path)
+    # Verify scene integrity and collect its frames; cached while the scene is unchanged
+    is_valid, info, frame_files = verify_and_get_frame_paths_cached(scene_path)
     if not is_valid:
         raise ValueError(f"Scene has mismatched files: {info}")
     
-    current_scene_path = scene_path
-    file_triplets = get_matched_file_triplets(scene_path)
-    scene_info = info
+    timestamps = tuple(frame_files['timestamps'])
+    scene = LoadedScene(
+        path=scene_path,
+        info=info,
+        token=str(time.time_ns()),
+        timestamps=timestamps,
+        rgb_paths=tuple(frame_files['rgb']),
+        depth_paths=tuple(frame_files['depth']),
+        intrinsics_paths=tuple(frame_files['intrinsics']),
+        ts_to_idx={timestamp: idx for idx, timestamp in enumerate(timestamps)},
+    )
+    _load_intrinsics_cached.cache_clear()
+    warm_depth_kernel()
+    loaded_scene = scene
     
-    return is_valid, info
+    return scene
+
+
+def _percentiles(values, percents):
+    """
+    np.percentile(values, percents) with its default linear interpolation, from one
+    np.partition() call shared by all the percentiles.
+    """
+    positions = [p / 100 * (values.size - 1) for p in percents]
+    lower = [int(np.floor(pos)) for pos in positions]
+    kth = sorted({k for low in lower for k in (low, min(low + 1, values.size - 1))})
+    part = np.partition(values, kth)
+    result = []
+    for pos, low in zip(positions, lower):
+        below = float(part[low])
+        above = float(part[min(low + 1, values.size - 1)])
+        result.append(below + (above - below) * (pos - low))
+    return result
+
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _colorize_depth(depth_image, lo, scale, lut):
+        """Scale, clip and look up the color of every depth pixel in one parallel pass."""
+        height, width = depth_image.shape
+        depth_rgb = np.empty((height, width, 3), np.uint8)
+        for i in prange(height):
+            for j in range(width):
+                # float32 math, truncated like the NumPy path
+                value = (np.float32(depth_image[i, j]) - lo) * scale
+                if not value > 0:
+                    level = 0
+                elif value >= 255:
+                    level = 255
+                else:
+                    level = int(value)
+                depth_rgb[i, j, 0] = lut[level, 0, 0]
+                depth_rgb[i, j, 1] = lut[level, 0, 1]
+                depth_rgb[i, j, 2] = lut[level, 0, 2]
+        return depth_rgb
+else:
+    _colorize_depth = None
+
+# Flask serves requests on concurrent threads, and numba's default workqueue threading
+# layer aborts the process if two threads run a parallel kernel at once
+_colorize_depth_lock = threading.Lock()
+
+
+def warm_depth_kernel():
+    """Compile the numba depth kernel (if available) before the first frame needs it."""
+    if _colorize_depth is not None:
+        with _colorize_depth_lock:
+            _colorize_depth(np.zeros((2, 2), np.uint16), np.float32(0), np.float32(1), _VIRIDIS_LUT_RGB)
 
 
-def create_depth_colormap_simple(depth_image, min_depth=None, max_depth=None):
-    """Create a simple grayscale visualization of depth image."""
-    # Convert depth to float and handle invalid values
-    depth = depth_image.astype(np.float32)
+def create_depth_colormap_simple(depth_image, min_depth=None, max_depth=None, units_per_meter=1.0, bgr=False):
+    """
+    Create a simple grayscale visualization of depth image.
+    depth_image may hold raw sensor units (e.g. uint16 millimeters, units_per_meter=1000);
+    min_depth/max_depth and the returned range are in meters.
+    The colors are RGB, or BGR (ready for cv2.imencode) if bgr is set.
+    """
+    # Set depth range over valid (non-zero) pixels
+    if min_depth is None or max_depth is None:
+        lo, hi = _percentiles(depth_image[depth_image > 0], [1, 99])
+        if min_depth is None:
+            min_depth = lo / units_per_meter
+        if max_depth is None:
+            max_depth = hi / units_per_meter
     
-    # Set depth range
-    if min_depth is None:
-        min_depth = np.percentile(depth[depth > 0], 1)
-    if max_depth is None:
-        max_depth = np.percentile(depth[depth > 0], 99)
+    # Normalize depth to 0-255 range in one pass over the raw values
+    lo = min_depth * units_per_meter
+    span = (max_depth - min_depth) * units_per_meter
+    scale = 255.0 / span if span > 0 else 0.0
+    lut = _VIRIDIS_LUT_BGR if bgr else _VIRIDIS_LUT_RGB
+    if _colorize_depth is not None and depth_image.ndim == 2:
+        with _colorize_depth_lock:
+            depth_rgb = _colorize_depth(depth_image, np.float32(lo), np.float32(scale), lut)
+        return depth_rgb, min_depth, max_depth
     
-    # Normalize depth to 0-255 range
-    depth_normalized = np.clip((depth - min_depth) / (max_depth - min_depth), 0, 1)
-    depth_uint8 = (depth_normalized * 255).astype(np.uint8)
+    depth_scaled = np.subtract(depth_image, lo, dtype=np.float32)
+    depth_scaled *= scale
+    np.clip(depth_scaled, 0, 255, out=depth_scaled)
+    depth_uint8 = depth_scaled.astype(np.uint8)
     
     # Convert to 3-channel for consistency
-    depth_rgb = cv2.applyColorMap(depth_uint8, cv2.COLORMAP_VIRIDIS)
-    depth_rgb = cv2.cvtColor(depth_rgb, cv2.COLOR_BGR2RGB)
+    depth_rgb = cv2.applyColorMap(depth_uint8, lut)
     
     return depth_rgb, min_depth, max_depth
 
 
-def array_to_base64(image_array):
-    """Convert numpy array to base64 string for web display."""
-    # Encode image as PNG
-    success, buffer = cv2.imencode('.png', cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR))
+# Lossy is fine for the depth visualization, and JPEG encodes several times faster than PNG
+DEPTH_IMAGE_FORMAT = 'jpg'
+JPEG_QUALITY = 85
+IMAGE_MIMETYPES = {'png': 'image/png', 'jpg': 'image/jpeg'}
+
+
+def encode_image(image_array, fmt='png', bgr=False):
+    """Encode an RGB (or, if bgr is set, BGR) numpy array as PNG or JPEG ('jpg') bytes."""
+    params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY] if fmt == 'jpg' else []
+    if not bgr:
+        image_array = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
+    success, buffer = cv2.imencode(f'.{fmt}', image_array, params)
     if not success:
         raise ValueError("Could not encode image")
+    return buffer.tobytes()
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def png_shape(data):
+    """
+    Shape cv2.imread() would give a PNG (height, width, 3), read from its IHDR chunk.
+    Returns None if data isn't a PNG.
+    """
+    if len(data) < 24 or not data.startswith(PNG_SIGNATURE) or data[12:16] != b'IHDR':
+        return None
+    width, height = struct.unpack('>II', data[16:24])
+    return (height, width, 3)
+
+
+def read_rgb_shape(rgb_path):
+    """Shape of an RGB frame: from the PNG header when possible, else by decoding it."""
+    with open(rgb_path, 'rb') as f:
+        shape = png_shape(f.read(24))
+    if shape is None:
+        rgb_image = cv2.imread(rgb_path)
+        if rgb_image is None:
+            raise ValueError(f'Could not load RGB image: {rgb_path}')
+        shape = rgb_image.shape
+    return shape
+
+
+@lru_cache(maxsize=256)
+def _load_depth_frame(depth_path, mtime_ns):
+    depth_image = cv2.imread(depth_path, cv2.IMREAD_UNCHANGED)
+    if depth_image is None:
+        raise ValueError(f'Could not load depth image: {depth_path}')
     
-    img_str = base64.b64encode(buffer).decode()
-    return f"data:image/png;base64,{img_str}"
+    # Create depth colormap straight from the millimeter values, colored in BGR so
+    # it goes to the encoder without a channel swap
+    depth_colored, min_depth, max_depth = create_depth_colormap_simple(depth_image, units_per_meter=1000.0, bgr=True)
+    return encode_image(depth_colored, DEPTH_IMAGE_FORMAT, bgr=True), float(min_depth), float(max_depth), depth_image.shape
+
+
+def load_depth_frame(depth_path):
+    """
+    Colorized depth image for a frame, cached (per file version) since scrubbing revisits frames.
+    Returns (encoded depth image in DEPTH_IMAGE_FORMAT, min_depth, max_depth, depth_shape).
+    """
+    return _load_depth_frame(depth_path, os.stat(depth_path).st_mtime_ns)
+
+
+@lru_cache(maxsize=8192)
+def _load_intrinsics_cached(intrinsics_path):
+    return load_camera_intrinsics(intrinsics_path)
+
+
+def load_frame_intrinsics(intrinsics_path):
+    """
+    Camera intrinsics of a frame, parsed once per file while the scene stays loaded
+    (load_scene() clears the cache). Returns a fresh dict each call.
+    """
+    return dict(_load_intrinsics_cached(intrinsics_path))
+
+
+def frame_paths(scene, frame_idx):
+    """(rgb, depth, intrinsics) paths of a frame of scene, or None if out of range (or no scene)."""
+    if scene is None or frame_idx >= len(scene.rgb_paths):
+        return None
+    return scene.rgb_paths[frame_idx], scene.depth_paths[frame_idx], scene.intrinsics_paths[frame_idx]
+
+
+def request_scene():
+    """
+    Snapshot of the loaded scene for an image request; None if no scene is loaded
+    or the ?scene= token belongs to one that no longer is.
+    """
+    scene = loaded_scene
+    token = request.args.get('scene')
+    if token is not None and (scene is None or token != scene.token):
+        return None
+    return scene
 
 
 @app.route('/')
@@ -150,15 +362,15 @@ def load_scene_route():
         if not os.path.exists(scene_path):
             return jsonify({'error': f'Scene path does not exist: {scene_path}'}), 400
         
-        is_valid, info = load_scene(scene_path)
+        scene = load_scene(scene_path)
         
         return jsonify({
             'success': True,
-            'scene_path': current_scene_path,
+            'scene_path': scene.path,
             'split': split,
             'scene_id': scene_id,
-            'total_frames': len(file_triplets),
-            'info': info
+            'total_frames': len(scene.rgb_paths),
+            'info': scene.info
         })
         
     except Exception as e:
@@ -167,57 +379,46 @@ def load_scene_route():
 
 @app.route('/get_frame/<int:frame_idx>')
 def get_frame(frame_idx):
-    """Get RGB and depth images for a specific frame index."""
+    """Get image URLs and metadata for a specific frame index."""
+    return frame_response(loaded_scene, frame_idx)
+
+
+def frame_response(scene, frame_idx):
+    """The /get_frame response for a frame of scene."""
     try:
-        if not file_triplets or frame_idx >= len(file_triplets):
+        paths = frame_paths(scene, frame_idx)
+        if paths is None:
             return jsonify({'error': 'Invalid frame index'}), 400
         
-        rgb_path, depth_path, intrinsics_path = file_triplets[frame_idx]
+        rgb_path, depth_path, intrinsics_path = paths
         
-        # Load RGB image
-        rgb_image = cv2.imread(rgb_path)
-        if rgb_image is None:
-            return jsonify({'error': f'Could not load RGB image: {rgb_path}'}), 500
-        rgb_image = cv2.cvtColor(rgb_image, cv2.COLOR_BGR2RGB)
-        
-        # Load depth image
-        depth_image = cv2.imread(depth_path, cv2.IMREAD_UNCHANGED)
-        if depth_image is None:
-            return jsonify({'error': f'Could not load depth image: {depth_path}'}), 500
-        
-        # Convert depth from millimeters to meters
-        depth_meters = depth_image.astype(np.float32) / 1000.0
-        
-        # Create depth colormap
-        depth_colored, min_depth, max_depth = create_depth_colormap_simple(depth_meters)
+        # The images themselves are fetched from /rgb and /depth
+        rgb_shape = read_rgb_shape(rgb_path)
+        _, min_depth, max_depth, depth_shape = load_depth_frame(depth_path)
         
         # Load camera intrinsics
-        intrinsics = load_camera_intrinsics(intrinsics_path)
+        intrinsics = load_frame_intrinsics(intrinsics_path)
         
         # Get file information
-        rgb_filename = Path(rgb_path).name
-        depth_filename = Path(depth_path).name
-        timestamp = rgb_filename.split('_')[-1].replace('.png', '')
-        
-        # Convert images to base64
-        rgb_b64 = array_to_base64(rgb_image)
-        depth_b64 = array_to_base64(depth_colored)
+        rgb_filename = os.path.basename(rgb_path)
+        depth_filename = os.path.basename(depth_path)
+        timestamp = scene.timestamps[frame_idx]
         
         return jsonify({
-            'rgb_image': rgb_b64,
-            'depth_image': depth_b64,
+            'rgb_url': f'/rgb/{frame_idx}?scene={scene.token}',
+            'depth_url': f'/depth/{frame_idx}?scene={scene.token}',
             'intrinsics': intrinsics,
             'frame_info': {
                 'index': frame_idx,
-                'total': len(file_triplets),
+                'total': len(scene.rgb_paths),
                 'timestamp': timestamp,
                 'rgb_filename': rgb_filename,
                 'depth_filename': depth_filename,
-                'rgb_shape': rgb_image.shape,
-                'depth_shape': depth_image.shape,
+                'rgb_shape': rgb_shape,
+                'depth_shape': depth_shape,
                 'depth_range': {
-                    'min': float(min_depth),
-                    'max': float(max_depth),
+                    'min': min_depth,
+                    'max': max_depth,
                     'unit': 'meters'
                 }
             }
@@ -227,16 +428,67 @@ def get_frame(frame_idx):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/frame_by_ts/<timestamp>')
+def get_frame_by_timestamp(timestamp):
+    """Get a frame as /get_frame does, by its timestamp (e.g. '57352.271')."""
+    scene = loaded_scene
+    frame_idx = scene.ts_to_idx.get(timestamp) if scene is not None else None
+    if frame_idx is None:
+        return jsonify({'error': f'No frame with timestamp {timestamp}'}), 404
+    return frame_response(scene, frame_idx)
+
+
+@app.route('/rgb/<int:frame_idx>')
+def get_rgb(frame_idx):
+    """RGB image file of a frame, sent as stored."""
+    try:
+        scene = request_scene()
+        if scene is None:
+            return jsonify({'error': 'Scene is not loaded'}), 404
+        paths = frame_paths(scene, frame_idx)
+        if paths is None:
+            return jsonify({'error': 'Invalid frame index'}), 400
+        # max_age=0 makes browsers revalidate, answered with 304 while the file is unchanged
+        return send_file(paths[0], conditional=True, max_age=0)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/depth/<int:frame_idx>')
+def get_depth(frame_idx):
+    """Colorized depth image of a frame, as DEPTH_IMAGE_FORMAT."""
+    try:
+        scene = request_scene()
+        if scene is None:
+            return jsonify({'error': 'Scene is not loaded'}), 404
+        paths = frame_paths(scene, frame_idx)
+        if paths is None:
+            return jsonify({'error': 'Invalid frame index'}), 400
+        
+        depth_path = paths[1]
+        depth_bytes = load_depth_frame(depth_path)[0]
+        # Versioned like the cache entry, so an unchanged file is answered with 304
+        st = os.stat(depth_path)
+        etag = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+        return send_file(io.BytesIO(depth_bytes), mimetype=IMAGE_MIMETYPES[DEPTH_IMAGE_FORMAT], etag=etag,
+                         conditional=True, max_age=0)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/scene_info')
 def get_scene_info():
     """Get information about the currently loaded scene."""
-    if not current_scene_path:
+    scene = loaded_scene
+    if scene is None:
         return jsonify({'error': 'No scene loaded'}), 400
     
     return jsonify({
-        'scene_path': current_scene_path,
-        'total_frames': len(file_triplets),
-        'scene_info': scene_info
+        'scene_path': scene.path,
+        'total_frames': len(scene.rgb_paths),
+        'scene_info': scene.info
     })
 
 
@@ -263,6 +515,7 @@ Examples:
     parser.add_argument('data_root', help='Path to data root directory containing Training and Validation folders')
     parser.add_argument('--port', type=int, default=5000, help='Port to run Flask server on (default: 5000)')
     parser.add_argument('--host', default='0.0.0.0', help='Host to bind Flask server to (default: 0.0.0.0)')
+    parser.add_argument('--no-prewarm', action='store_true', help='Do not build the scene cache for all scenes at startup')
     
     args = parser.parse_args()
     
@@ -279,7 +532,15 @@ Examples:
         print(f"❌ Error validating data structure: {e}")
         sys.exit(1)
     
+    debug = True
+    
+    # With the debug reloader the script also runs in a watcher process; only the
+    # serving process (WERKZEUG_RUN_MAIN set) prewarms
+    if not args.no_prewarm and (not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        prewarm_scene_cache(data_root, available_scenes)
+        print(f"🔥 Prewarming scene cache for {len(training_scenes) + len(validation_scenes)} scenes in the background")
+    
     print("🌐 Starting Flask server...")
     print(f"📱 Open http://localhost:{args.port} in your browser")
     print(f"🛑 Press Ctrl+C to stop the server")
-    app.run(debug=True, host=args.host, port=args.port)
\ No newline at end of file
+    app.run(debug=debug, host=args.host, port=args.port)
\ No newline at end of file